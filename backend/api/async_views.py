@@ -0,0 +1,92 @@
+"""
+Асинхронные маршруты чтения для режима ASGI.
+
+В Django 3.2 нет асинхронного ORM, поэтому код вьюсета DRF выполняется
+в ограниченном пуле потоков, а цикл событий тем временем обслуживает
+остальные соединения. Число потоков пула ограничивает и число
+соединений с базой на воркер. Запись идет обычным путем Django для
+синхронных вьюх.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+READ_ACTIONS = {'list', 'retrieve'}
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_read_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_READ_VIEWS['THREADS'],
+                thread_name_prefix='api-read',
+            )
+    return _executor
+
+
+def render_in_thread(view, request, *args, **kwargs):
+    """
+    Выполняет вьюху и рендерит ответ в потоке пула. Соединения потока
+    закрываются по тем же правилам, что и после обычного запроса.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+async def run_read(view, request, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_read_executor(),
+        functools.partial(
+            context.run, render_in_thread, view, request, *args, **kwargs
+        ),
+    )
+
+
+def async_read_view(view):
+    """
+    Асинхронная обертка для view из as_view(): чтение выполняется в пуле
+    потоков, остальные методы - как синхронная вьюха в Django.
+    """
+    write = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await run_read(view, request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    return functools.wraps(view)(async_view)
+
+
+class AsyncReadMixin:
+    """
+    При ASYNC_READ_VIEWS['ENABLED'] маршруты вьюсета с действиями list
+    и retrieve становятся асинхронными.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_READ_VIEWS['ENABLED']:
+            return view
+        if READ_ACTIONS.isdisjoint((actions or {}).values()):
+            return view
+        return async_read_view(view)
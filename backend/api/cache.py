@@ -0,0 +1,178 @@
+import copy
+import hashlib
+import logging
+import time
+from functools import partial
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from rest_framework.response import Response
+
+from foodgram.db.replicas import use_primary
+from recipes.catalog import (INGREDIENT_CATALOG_VERSION_KEY,
+                             RECIPE_AUTHORS_VERSION_KEY,
+                             RECIPE_LIST_VERSION_KEY, TAG_REGISTRY_VERSION_KEY,
+                             get_versions, recipe_version_key)
+from recipes.user_state import get_request_user_state
+
+logger = logging.getLogger('foodgram.cache')
+
+STATS_KEY = 'response_cache_stats:{}'
+STATS_EVENTS = ('hit', 'miss', 'wait')
+# Фильтры, результат которых зависит от пользователя.
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+# Данные, общие для всех рецептов в ответе: теги, ингредиенты, авторы.
+SHARED_VERSION_KEYS = [
+    TAG_REGISTRY_VERSION_KEY,
+    INGREDIENT_CATALOG_VERSION_KEY,
+    RECIPE_AUTHORS_VERSION_KEY,
+]
+
+
+def record(event):
+    key = STATS_KEY.format(event)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счетчик вытеснен из кэша между add и incr.
+        pass
+
+
+def get_stats():
+    return {
+        event: cache.get(STATS_KEY.format(event), 0)
+        for event in STATS_EVENTS
+    }
+
+
+def normalize_params(query_params):
+    """Параметры запроса в порядке, не зависящем от их порядка в URL."""
+    return urlencode(
+        sorted(
+            (key, value)
+            for key in query_params
+            for value in query_params.getlist(key)
+        )
+    )
+
+
+def apply_user_state(data, state):
+    """
+    Проставляет в рецептах ответа признаки пользователя. Без множеств
+    пользователя (state is None) признаки сбрасываются, как для анонима.
+    """
+    recipes = data['results'] if 'results' in data else [data]
+    for recipe in recipes:
+        author = recipe['author']
+        if state is None:
+            recipe['is_favorited'] = False
+            recipe['is_in_shopping_cart'] = False
+            author['is_subscribed'] = False
+        else:
+            recipe['is_favorited'] = recipe['id'] in state.favorites
+            recipe['is_in_shopping_cart'] = recipe['id'] in state.cart
+            author['is_subscribed'] = author['id'] in state.following
+    return data
+
+
+class RecipeResponseCacheMixin:
+    """
+    Кэширует ответы list и retrieve. В кэше хранится ответ, общий для
+    всех пользователей (как для анонима); признаки избранного, покупок
+    и подписки для пользователя проставляются по его множествам id
+    (recipes.user_state). Ключ включает версии данных, которые меняются
+    при изменении рецептов, тегов, ингредиентов и авторов. Ответ
+    пересчитывает один запрос, остальные ждут его результата.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            [RECIPE_LIST_VERSION_KEY],
+            partial(super().list, request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except ValueError:
+            # Версия создается только для id, которые могут существовать.
+            raise Http404
+        return self.cached_response(
+            request,
+            [recipe_version_key(pk)],
+            partial(super().retrieve, request, *args, **kwargs),
+        )
+
+    def get_cache_key(self, request, version_keys):
+        versions = get_versions(version_keys + SHARED_VERSION_KEYS)
+        parts = [
+            request.get_host(),
+            request.path,
+            normalize_params(request.query_params),
+            *versions,
+        ]
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+        return f'response:{digest}'
+
+    def cached_response(self, request, version_keys, build):
+        config = settings.RECIPE_RESPONSE_CACHE
+        if not config['ENABLED'] or not self.is_shared(request):
+            return build()
+        state = get_request_user_state(request)
+        key = self.get_cache_key(request, version_keys)
+        data = cache.get(key)
+        if data is not None:
+            return self.cache_hit(apply_user_state(data, state), 'hit')
+
+        lock = f'{key}:lock'
+        locked = cache.add(lock, 1, timeout=config['LOCK_TIMEOUT'])
+        if not locked:
+            data = self.wait_for(key, config['LOCK_WAIT'])
+            if data is not None:
+                return self.cache_hit(apply_user_state(data, state), 'wait')
+        record('miss')
+        try:
+            # Ответ попадет в кэш под текущими версиями, поэтому читается
+            # из основной базы, а не из отстающей реплики.
+            with use_primary():
+                response = build()
+            if response.status_code == 200:
+                data = response.data
+                if state is not None:
+                    data = apply_user_state(copy.deepcopy(data), None)
+                cache.set(key, data, timeout=config['TIMEOUT'])
+        finally:
+            if locked:
+                cache.delete(lock)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def is_shared(self, request):
+        """Ответ можно взять из общего кэша: для анонима или для
+        пользователя с множествами id, если выборка от него не зависит."""
+        if request.user.is_anonymous:
+            return True
+        return settings.USER_STATE_ENABLED and not any(
+            name in request.query_params for name in USER_FILTERS
+        )
+
+    def wait_for(self, key, timeout):
+        """Ждет ответ, который вычисляет другой запрос."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        logger.warning('Не дождались ответа в кэше %s', key)
+        return None
+
+    def cache_hit(self, data, event):
+        record(event)
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
@@ -1,15 +1,205 @@
 import base64
+import tempfile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
 from rest_framework import serializers
 
+from recipes.images import (rendition_names, renditions_ready,
+                            renditions_storage)
+
+BASE64_PREFIX = ';base64,'
+# Длина части строки base64, декодируемой за раз.
+DECODE_CHUNK_SIZE = 64 * 1024
+# Размер начала файла, в котором ищется заголовок с размерами картинки.
+HEADER_MAX_SIZE = 256 * 1024
+# Разрешенные форматы картинок (по данным Pillow) и расширения файлов.
+IMAGE_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
 
 class Base64ImageField(serializers.ImageField):
-    """Сериализатор для создания кастомного типа поля для картинки"""
+    """
+    Сериализатор для создания кастомного типа поля для картинки.
+
+    Строка data:image/...;base64 декодируется по частям во временный
+    файл: в памяти до FILE_UPLOAD_MAX_MEMORY_SIZE, дальше на диске.
+    Расширение файла берется из формата, определенного по содержимому,
+    а не из MIME-типа строки.
+    Слишком большие картинки отклоняются до декодирования по длине
+    строки и по размерам в пикселях из заголовка картинки.
+    """
+
+    default_error_messages = {
+        'too_large': 'Размер картинки больше {max_size} байт.',
+        'too_many_pixels': 'Картинка больше {max_pixels} пикселей.',
+    }
+
+    def __init__(self, max_size=None, max_pixels=None, **kwargs):
+        self.max_size = max_size
+        self.max_pixels = max_pixels
+        super().__init__(**kwargs)
+
+    def get_max_size(self):
+        return self.max_size or settings.IMAGE_UPLOAD_MAX_SIZE
+
+    def get_max_pixels(self):
+        return self.max_pixels or settings.IMAGE_UPLOAD_MAX_PIXELS
 
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+        if not (isinstance(data, str) and data.startswith('data:image')):
+            return super().to_internal_value(data)
+        prefix_end = data.find(BASE64_PREFIX, 0, 100)
+        if prefix_end == -1:
+            self.fail('invalid_image')
+        start = prefix_end + len(BASE64_PREFIX)
+        max_size = self.get_max_size()
+        if (len(data) - start) // 4 * 3 > max_size:
+            self.fail('too_large', max_size=max_size)
+        file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            self.decode(data, start, file)
+            ext = self.verify(file)
+        except serializers.ValidationError:
+            file.close()
+            raise
+        return serializers.FileField.to_internal_value(
+            self, File(file, name='temp.' + ext)
+        )
+
+    def decode(self, data, start, file):
+        """
+        Декодирует base64 по частям. Пробельные символы (переносы строк)
+        пропускаются, остаток части, не кратный 4 символам, переносится
+        в следующую.
+        """
+        checked = False
+        rest = ''
+        for position in range(start, len(data), DECODE_CHUNK_SIZE):
+            chunk = rest + ''.join(
+                data[position:position + DECODE_CHUNK_SIZE].split()
+            )
+            end = len(chunk) // 4 * 4
+            chunk, rest = chunk[:end], chunk[end:]
+            self.write_decoded(chunk, file)
+            if not checked and file.tell() <= HEADER_MAX_SIZE:
+                checked = self.check_pixels(file)
+        if rest:
+            self.fail('invalid_image')
+
+    def write_decoded(self, chunk, file):
+        try:
+            file.write(base64.b64decode(chunk, validate=True))
+        except ValueError:
+            # binascii.Error или символы вне ASCII.
+            self.fail('invalid_image')
+
+    def check_pixels(self, file):
+        """
+        Проверяет размеры картинки по уже декодированному началу файла.
+        Возвращает False, если заголовок еще не прочитан целиком.
+        """
+        position = file.tell()
+        file.seek(0)
+        max_pixels = self.get_max_pixels()
+        try:
+            width, height = Image.open(file).size
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        except (OSError, SyntaxError, ValueError):
+            return False
+        finally:
+            file.seek(position)
+        if width * height > max_pixels:
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        return True
+
+    def verify(self, file):
+        """
+        Проверяет, что файл целиком является картинкой разрешенного
+        формата, и возвращает расширение по формату, определенному Pillow.
+        """
+        self.check_pixels(file)
+        file.seek(0)
+        try:
+            image = Image.open(file)
+            image.verify()
+        except Exception:
+            self.fail('invalid_image')
+        file.seek(0)
+        ext = IMAGE_FORMATS.get(image.format)
+        if ext is None:
+            self.fail('invalid_image')
+        return ext
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """
+    Список id объектов. Все объекты загружаются одним запросом id__in,
+    ошибки возвращаются по позициям в списке.
+    """
+
+    child = serializers.IntegerField(min_value=1)
+    default_error_messages = {
+        'does_not_exist': serializers.PrimaryKeyRelatedField
+        .default_error_messages['does_not_exist'],
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        objects = self.queryset.in_bulk(pks)
+        errors = {
+            index: [self.error_messages['does_not_exist'].format(
+                pk_value=pk
+            )]
+            for index, pk in enumerate(pks) if pk not in objects
+        }
+        if errors:
+            raise serializers.ValidationError(errors)
+        return [objects[pk] for pk in pks]
+
+    def to_representation(self, data):
+        if hasattr(data, 'all'):
+            data = data.all()
+        return [obj.pk for obj in data]
+
+
+class ImageRenditionsField(serializers.Field):
+    """
+    Ссылки на уменьшенные копии картинки. Пока копии не готовы,
+    все ссылки ведут на оригинал.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_url(self, storage, name):
+        url = storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        names = rendition_names(value.name)
+        if not renditions_ready(value.name, value.storage):
+            original = self.get_url(value.storage, value.name)
+            return {key: original for key in names}
+        storage = renditions_storage(value.storage)
+        return {
+            key: self.get_url(storage, name) for key, name in names.items()
+        }
@@ -1,12 +1,29 @@
 import django_filters as filters
+from django.db.models import Case, F, IntegerField, Value, When
 from django_filters import rest_framework as filter
+from rest_framework.filters import OrderingFilter
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.catalog import get_tag_registry
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
 from users.models import CustomUser
 
 
 class IngredientFilter(filter.FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        """
+        Автодополнение: сначала ингредиенты, название которых начинается
+        с введенной строки, затем содержащие ее.
+        """
+        return queryset.filter(name__icontains=value).annotate(
+            is_substring=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('is_substring', 'name')
 
     class Meta:
         model = Ingredient
@@ -17,11 +34,10 @@ class IngredientFilter(filter.FilterSet):
 
 class RecipeFilter(filter.FilterSet):
     author = filter.ModelChoiceFilter(queryset=CustomUser.objects.all())
-    tags = filter.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
+    tags = filter.MultipleChoiceFilter(
+        choices=lambda: get_tag_registry().slug_choices(),
+        method='filter_tags',
         label='Tags',
-        to_field_name='slug',
     )
 
     is_favorited = filter.BooleanFilter(
@@ -30,6 +46,15 @@ class RecipeFilter(filter.FilterSet):
     is_in_shopping_cart = filter.BooleanFilter(
         method='filter_is_in_shopping_cart',
     )
+    search = filter.CharFilter(method='filter_search')
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        by_slug = get_tag_registry().by_slug
+        return queryset.filter(
+            tags__in=[by_slug[slug].pk for slug in value]
+        ).distinct()
 
     def filter_is_favorited(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
@@ -43,6 +68,10 @@ class RecipeFilter(filter.FilterSet):
             )
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """Поиск по названию и тексту, сначала самые релевантные."""
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = [
@@ -50,4 +79,41 @@ class RecipeFilter(filter.FilterSet):
             'author',
             'is_favorited',
             'is_in_shopping_cart',
+            'search',
         ]
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    Сортировка рецептов, в том числе по популярности (?ordering=-popularity).
+    Рецепты, еще не попавшие в рейтинг, появляются в выдаче после
+    следующего пересчета.
+    """
+
+    popularity_field = 'popularity'
+
+    def get_valid_fields(self, queryset, view, context={}):
+        return super().get_valid_fields(queryset, view, context) + [
+            (self.popularity_field, self.popularity_field),
+        ]
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        if any(
+            field.lstrip('-') == self.popularity_field for field in ordering
+        ):
+            queryset = with_popularity(queryset)
+        return queryset.order_by(*ordering)
+
+
+def with_popularity(queryset):
+    """
+    Рецепты из рейтинга с аннотацией popularity. Соединение с рейтингом
+    внутреннее, поэтому сортировка (popularity, id) читает индекс
+    (score DESC, recipe_id DESC) только в пределах страницы.
+    """
+    return queryset.filter(ranking__isnull=False).annotate(
+        popularity=F('ranking__score')
+    )
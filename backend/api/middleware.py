@@ -0,0 +1,191 @@
+import asyncio
+import contextvars
+import heapq
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('foodgram.queries')
+
+# Статистика текущего HTTP-запроса. Контекст передается в потоки
+# sync_to_async и пула чтения, поэтому запросы к базе из них тоже
+# попадают в статистику своего HTTP-запроса.
+current_stats = contextvars.ContextVar('query_budget_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос к API выполнил больше SQL-запросов, чем разрешено."""
+
+
+class QueryStats:
+    """Статистика SQL-запросов, выполненных за один HTTP-запрос."""
+
+    def __init__(self, slowest_size):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_size = slowest_size
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            item = (duration, self.count, sql)
+            if len(self.slowest) < self.slowest_size:
+                heapq.heappush(self.slowest, item)
+            elif self.slowest and item > self.slowest[0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def slowest_statements(self):
+        return [
+            (round(duration * 1000, 2), sql)
+            for duration, _, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+def count_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_counter(connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает SQL-запросы и время работы с БД для каждого вьюсета и действия.
+
+    Результат отдается в заголовке Server-Timing и пишется в лог
+    (для потоковых ответов - только в лог, после чтения всего ответа);
+    при превышении бюджета из настройки QUERY_BUDGET пишется
+    предупреждение или, если включен RAISE, выбрасывается исключение.
+    Работает и в синхронном, и в асинхронном (ASGI) режиме.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not self.config.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        connection_created.connect(
+            install_counter, dispatch_uid='query_budget_counter'
+        )
+        for connection in connections.all():
+            install_counter(connection)
+
+    @property
+    def config(self):
+        return getattr(settings, 'QUERY_BUDGET', {})
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = QueryStats(self.config.get('SLOWEST', 3))
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = QueryStats(self.config.get('SLOWEST', 3))
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        route = getattr(request, 'query_budget_route', None)
+        if route is None:
+            return response
+        if response.streaming:
+            # Запросы потокового ответа выполняются при чтении тела, уже
+            # после отправки заголовков: статистика пишется в лог, когда
+            # ответ прочитан целиком, без заголовка Server-Timing.
+            response.streaming_content = self.measure_stream(
+                response.streaming_content, request, response, stats, route
+            )
+            return response
+        response['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.2f};'
+            f'desc="{stats.count} queries"'
+        )
+        self.log_stats(request, response, stats, route)
+        return response
+
+    def measure_stream(self, content, request, response, stats, route):
+        content = iter(content)
+        while True:
+            token = current_stats.set(stats)
+            try:
+                chunk = next(content, None)
+            finally:
+                current_stats.reset(token)
+            if chunk is None:
+                break
+            yield chunk
+        self.log_stats(request, response, stats, route)
+
+    def log_stats(self, request, response, stats, route):
+        db_ms = stats.duration * 1000
+        logger.info(
+            'route=%s method=%s status=%s queries=%d db_ms=%.2f',
+            route,
+            request.method,
+            response.status_code,
+            stats.count,
+            db_ms,
+            extra={
+                'route': route,
+                'queries': stats.count,
+                'db_ms': round(db_ms, 2),
+                'slowest': stats.slowest_statements(),
+            },
+        )
+        self.check_budget(route, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget_route = self.get_route(request, view_func)
+
+    def get_route(self, request, view_func):
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            return f'{view_func.__module__}.{view_func.__name__}'
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+
+    def check_budget(self, route, stats):
+        config = self.config
+        budget = config.get('ROUTES', {}).get(route, config.get('DEFAULT'))
+        if budget is None or stats.count <= budget:
+            return
+        message = (
+            f'{route}: выполнено {stats.count} SQL-запросов '
+            f'при бюджете {budget}'
+        )
+        if config.get('RAISE', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(
+            message,
+            extra={'slowest': stats.slowest_statements()},
+        )
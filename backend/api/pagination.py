@@ -1,6 +1,187 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк по статистике PostgreSQL (pg_class.reltuples).
+    Доступна только для нефильтрованных запросов, иначе None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
 
 
 class CustomPagination(PageNumberPagination):
+    """
+    Постраничная пагинация (?page=, ?limit=) для текущего фронтенда.
+
+    Если передан параметр ?cursor= (пустой для первой страницы),
+    включается keyset-пагинация: следующая страница выбирается условием
+    по ключу сортировки (например, (pub_date, id)) вместо OFFSET,
+    а точный COUNT(*) не выполняется - в count отдается оценка
+    из статистики PostgreSQL или null.
+    """
+
     page_size_query_param = 'limit'
     page_size = 6
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        self.count = estimate_count(queryset)
+
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_position = (
+            self.get_position(page[-1]) if self.has_next else None
+        )
+        return page
+
+    def get_ordering(self, queryset):
+        """
+        Ключ сортировки: явная сортировка запроса или Meta.ordering модели,
+        дополненная первичным ключом для уникальности. Все поля ключа
+        должны сортироваться в одном направлении и быть столбцами таблицы
+        модели или аннотациями запроса.
+        """
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if not ordering:
+            ordering = ['-pk']
+        descending = ordering[0].startswith('-')
+        if any(field.startswith('-') != descending for field in ordering):
+            self.unsupported_ordering()
+        prefix = '-' if descending else ''
+        ordering = [
+            prefix + self.get_key_column(queryset, field.lstrip('-'))
+            for field in ordering
+        ]
+        pk = queryset.model._meta.pk.attname
+        if prefix + pk not in ordering:
+            ordering.append(prefix + pk)
+        return ordering
+
+    def get_key_column(self, queryset, name):
+        """
+        Атрибут объекта со значением поля ключа: attname столбца модели
+        (author_id для внешнего ключа) или имя аннотации.
+        """
+        if name in queryset.query.annotations:
+            return name
+        opts = queryset.model._meta
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            self.unsupported_ordering()
+        if not field.concrete or field.many_to_many:
+            self.unsupported_ordering()
+        return field.attname
+
+    def unsupported_ordering(self):
+        raise ValidationError(
+            {'cursor': 'Сортировка не поддерживается этой пагинацией.'}
+        )
+
+    def get_position(self, obj):
+        return [
+            getattr(obj, field.lstrip('-')) for field in self.ordering
+        ]
+
+    def get_keyset_filter(self, position):
+        """
+        Условие "строго после позиции" для составного ключа:
+        (a < x) OR (a = x AND b < y) OR ...; дополнительное условие a <= x
+        позволяет использовать составной индекс для сканирования диапазона.
+        """
+        lookup = 'lt' if self.ordering[0].startswith('-') else 'gt'
+        fields = [field.lstrip('-') for field in self.ordering]
+        conditions = []
+        for index, field in enumerate(fields):
+            equal = {
+                name: value
+                for name, value in zip(fields[:index], position[:index])
+            }
+            conditions.append(
+                Q(**equal, **{f'{field}__{lookup}': position[index]})
+            )
+        return Q(**{f'{fields[0]}__{lookup}e': position[0]}) & reduce(
+            or_, conditions
+        )
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Некорректный курсор.')
+        if not isinstance(position, list) or (
+            len(position) != len(self.ordering)
+        ):
+            raise NotFound('Некорректный курсор.')
+        return position
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return None
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
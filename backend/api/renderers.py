@@ -0,0 +1,133 @@
+import abc
+import csv
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+SHOPPING_LIST_TITLE = 'Список покупок'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ShoppingListRenderer(BaseRenderer, abc.ABC):
+    """
+    Базовый рендерер списка покупок.
+
+    Строки списка - словари с ключами ingredient__name,
+    ingredient__measurement_unit и amount_sum - читаются из итератора
+    и отдаются по частям, поэтому список не собирается целиком в памяти.
+    """
+
+    charset = 'utf-8'
+
+    @abc.abstractmethod
+    def stream(self, rows):
+        """Итератор байтовых частей документа."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(
+                f'{key}: {value}' for key, value in data.items()
+            ).encode('utf-8')
+        return b''.join(self.stream(data))
+
+
+class TxtShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield f'{SHOPPING_LIST_TITLE}:\n'.encode(self.charset)
+        for row in rows:
+            yield (
+                f"{row['ingredient__name']} - {row['amount_sum']} "
+                f"{row['ingredient__measurement_unit']}\n"
+            ).encode(self.charset)
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку вместо хранения."""
+
+    def write(self, value):
+        return value
+
+
+class CsvShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ['Ингредиент', 'Количество', 'Единица измерения']
+        ).encode(self.charset)
+        for row in rows:
+            yield writer.writerow([
+                row['ingredient__name'],
+                row['amount_sum'],
+                row['ingredient__measurement_unit'],
+            ]).encode(self.charset)
+
+
+class PdfShoppingListRenderer(ShoppingListRenderer):
+    """
+    Рендерер списка покупок в PDF.
+
+    Страницы дописываются по мере чтения строк, а готовый документ
+    пишется во временный файл, который сбрасывается на диск при
+    превышении SHOPPING_LIST_PDF_SPOOL_SIZE, и отдается по частям.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 20 * mm
+    line_height = 7 * mm
+
+    def register_font(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_FONT)
+            )
+
+    def stream(self, rows):
+        self.register_font()
+        width, height = A4
+        with SpooledTemporaryFile(
+            max_size=settings.SHOPPING_LIST_PDF_SPOOL_SIZE
+        ) as file:
+            pdf = canvas.Canvas(file, pagesize=A4)
+            pdf.setTitle(SHOPPING_LIST_TITLE)
+            pdf.setFont(self.font_name, self.font_size + 4)
+            y = height - self.margin
+            pdf.drawString(self.margin, y, f'{SHOPPING_LIST_TITLE}:')
+            pdf.setFont(self.font_name, self.font_size)
+            for row in rows:
+                y -= self.line_height
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(self.font_name, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(
+                    self.margin,
+                    y,
+                    f"{row['ingredient__name']} - {row['amount_sum']} "
+                    f"{row['ingredient__measurement_unit']}",
+                )
+            pdf.save()
+            file.seek(0)
+            yield from iter(lambda: file.read(STREAM_CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_RENDERERS = [
+    TxtShoppingListRenderer,
+    CsvShoppingListRenderer,
+    PdfShoppingListRenderer,
+]
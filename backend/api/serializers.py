@@ -1,20 +1,28 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
-from api.fields import Base64ImageField
+from api.fields import (Base64ImageField, ImageRenditionsField,
+                        PrimaryKeyListField)
+from recipes.catalog import get_ingredient_catalog
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.user_state import get_request_user_state
 from users.serializers import CustomUserSerializer
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Укороченный сериализатор для модели Recipe."""
 
+    images = ImageRenditionsField(source='image')
+
     class Meta:
         model = Recipe
         fields = [
             'id',
             'name',
             'image',
+            'images',
             'cooking_time',
         ]
 
@@ -85,10 +93,11 @@ class RecipeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField()
+    images = ImageRenditionsField(source='image')
     ingredients = RecipeIngredientSerializer(
         many=True,
         read_only=True,
-        source='recipeingredient_set',
+        source='recipe_ingredients',
     )
 
     is_favorited = serializers.SerializerMethodField(
@@ -107,36 +116,42 @@ class RecipeSerializer(serializers.ModelSerializer):
             'author',
             'ingredients',
             'image',
+            'images',
             'text',
             'is_favorited',
             'is_in_shopping_cart',
             'cooking_time',
         ]
 
-    def in_list_exists(self, obj, model):
-        user = self.context['request'].user
+    def in_list_exists(self, obj, model, annotation):
+        request = self.context['request']
+        user = request.user
         if user.is_anonymous:
             return False
+        state = get_request_user_state(request)
+        if state is not None:
+            ids = state.favorites if model is Favorite else state.cart
+            return obj.pk in ids
+        flag = getattr(obj, annotation, None)
+        if flag is not None:
+            return flag
         return model.objects.filter(
             user=user,
             recipe=obj,
         ).exists()
 
     def get_is_favorited(self, obj):
-        return self.in_list_exists(obj, Favorite)
+        return self.in_list_exists(obj, Favorite, 'favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return self.in_list_exists(obj, ShoppingCart)
+        return self.in_list_exists(obj, ShoppingCart, 'in_shopping_cart')
 
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и редактирования рецептов."""
 
     ingredients = AddIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
-    )
+    tags = PrimaryKeyListField(queryset=Tag.objects.all())
     image = Base64ImageField()
     author = CustomUserSerializer(read_only=True)
     cooking_time = serializers.IntegerField(min_value=1)
@@ -154,44 +169,98 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             'image',
         ]
 
+    def get_ingredients(self, ing_ids):
+        """Ингредиенты по id из справочника или одним запросом id__in."""
+        if settings.INGREDIENT_CATALOG_ENABLED:
+            return get_ingredient_catalog().in_bulk(ing_ids)
+        return Ingredient.objects.in_bulk(ing_ids)
+
     def validate_ingredients(self, ingredients):
         ing_ids = [ingredient['id'] for ingredient in ingredients]
-        if len(ing_ids) != len(set(ing_ids)):
-            raise serializers.ValidationError(
-                'Нельзя дублировать ингредиенты.'
-            )
-
+        found = self.get_ingredients(ing_ids)
+        errors = [{} for _ in ingredients]
+        seen = set()
+        for index, ing_id in enumerate(ing_ids):
+            if ing_id not in found:
+                errors[index] = {'id': [f'Ингредиент {ing_id} не найден.']}
+            elif ing_id in seen:
+                errors[index] = {'id': ['Нельзя дублировать ингредиенты.']}
+            seen.add(ing_id)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        for ingredient in ingredients:
+            ingredient['ingredient'] = found[ingredient['id']]
         return ingredients
 
     def create_ings(self, ingredients, recipe):
         RecipeIngredient.objects.bulk_create([RecipeIngredient(
-            ingredient_id=ingredient['id'],
+            ingredient=ingredient['ingredient'],
             recipe=recipe,
             amount=ingredient['amount'])
             for ingredient in ingredients])
 
+    def update_ings(self, ingredients, recipe):
+        """
+        Приводит ингредиенты рецепта к переданному списку: удаляет
+        лишние строки, меняет количество у изменившихся и добавляет новые.
+        """
+        current = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            row = current.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        added = [
+            ingredient for ingredient in ingredients
+            if ingredient['id'] not in current
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            self.create_ings(added, recipe)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
 
         recipe = Recipe.objects.create(**validated_data)
-
-        for tag in tags:
-            recipe.tags.add(tag)
-
+        recipe.tags.add(*tags)
         self.create_ings(ingredients, recipe)
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
+        tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
 
+        # Блокировка строки рецепта: одновременные правки выполняются
+        # по очереди, и каждая применяется к состоянию, прочитанному
+        # под блокировкой, а не загруженному до нее.
+        instance = Recipe.objects.select_for_update().defer(
+            'search_vector'
+        ).get(pk=instance.pk)
+
         if tags is not None:
             instance.tags.set(tags)
 
         if ingredients:
-            RecipeIngredient.objects.filter(recipe=instance).delete()
-            self.create_ings(ingredients, recipe=instance)
+            self.update_ings(ingredients, recipe=instance)
 
         return super().update(instance, validated_data)
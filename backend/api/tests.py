@@ -0,0 +1,639 @@
+import asyncio
+import base64
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.template import engines
+from django.template.response import SimpleTemplateResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from PIL import Image, ImageOps
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.async_views import async_read_view
+from api.fields import DECODE_CHUNK_SIZE, Base64ImageField
+from api.middleware import QueryBudgetExceeded
+from api.renderers import ShoppingListRenderer
+from api.serializers import CreateRecipeSerializer
+from api.views import RecipeViewSet, TagViewSet
+from foodgram.db.replicas import read_alias
+from recipes.catalog import RECIPE_VERSION_TIMEOUT, recipe_version_key
+from recipes.images import (rendition_names, renditions_ready,
+                            renditions_storage, schedule_renditions)
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.popularity import refresh_popularity
+from users.models import CustomUser, Subscription
+
+RECIPES_URL = '/api/recipes/'
+NO_RESPONSE_CACHE = {
+    'ENABLED': False, 'TIMEOUT': 0, 'LOCK_TIMEOUT': 0, 'LOCK_WAIT': 0,
+}
+
+
+def create_user(username):
+    return CustomUser.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        first_name=username,
+        last_name=username,
+        password='test-password',
+    )
+
+
+def create_recipes(author, count, tags, ingredients):
+    recipes = []
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'{author.username} рецепт {number}',
+            text='Текст рецепта',
+            cooking_time=10,
+            image='recipes/images/test.png',
+        )
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        ])
+        recipes.append(recipe)
+    return recipes
+
+
+class RecipeFixtureMixin:
+    """Авторы с рецептами, тегами и ингредиентами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.authors = [create_user(f'author{number}') for number in range(3)]
+        cls.tags = [
+            Tag.objects.create(name='Завтрак', color=Tag.ORANGE,
+                               slug='breakfast'),
+            Tag.objects.create(name='Обед', color=Tag.GREEN, slug='lunch'),
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(3)
+        ]
+        cls.recipes = []
+        for author in cls.authors:
+            cls.recipes += create_recipes(
+                author, 4, cls.tags, cls.ingredients
+            )
+        Subscription.objects.create(user=cls.user, author=cls.authors[0])
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE)
+class RecipeListQueriesTest(RecipeFixtureMixin, TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    PAGE_SIZES = (1, 5, 12)
+
+    def assert_constant_queries(self, queries):
+        # Первый запрос заполняет справочники и множества пользователя.
+        self.client.get(RECIPES_URL)
+        for limit in self.PAGE_SIZES:
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        RECIPES_URL, {'limit': limit}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous(self):
+        # COUNT, страница рецептов с авторами, теги, ингредиенты.
+        self.assert_constant_queries(4)
+
+    def test_authenticated(self):
+        self.client.force_authenticate(self.user)
+        self.assert_constant_queries(4)
+
+    @override_settings(USER_STATE_ENABLED=False)
+    def test_authenticated_without_user_state(self):
+        # Признаки считаются подзапросами Exists, авторы с подпиской
+        # загружаются отдельным запросом.
+        self.client.force_authenticate(self.user)
+        self.assert_constant_queries(5)
+
+    def test_flags(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(RECIPES_URL, {'limit': 12})
+        flags = {
+            recipe['id']: (
+                recipe['is_favorited'],
+                recipe['is_in_shopping_cart'],
+                recipe['author']['is_subscribed'],
+            )
+            for recipe in response.data['results']
+        }
+        self.assertEqual(flags[self.recipes[0].pk], (True, False, True))
+        self.assertEqual(flags[self.recipes[1].pk], (False, True, True))
+        self.assertEqual(flags[self.recipes[-1].pk], (False, False, False))
+
+
+def query_budget(**routes):
+    return {
+        'ENABLED': True, 'RAISE': True, 'DEFAULT': 20, 'SLOWEST': 3,
+        'ROUTES': routes,
+    }
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE)
+class QueryBudgetMiddlewareTest(RecipeFixtureMixin, TestCase):
+
+    @override_settings(QUERY_BUDGET=query_budget())
+    def test_server_timing_and_log(self):
+        with self.assertLogs('foodgram.queries', 'INFO') as logs:
+            response = self.client.get(RECIPES_URL)
+        self.assertRegex(
+            response['Server-Timing'], r'^db;dur=[\d.]+;desc="4 queries"$'
+        )
+        record = logs.records[0]
+        self.assertEqual(record.route, 'RecipeViewSet.list')
+        self.assertEqual(record.queries, 4)
+        self.assertEqual(len(record.slowest), 3)
+
+    @override_settings(QUERY_BUDGET=query_budget(**{'RecipeViewSet.list': 1}))
+    def test_raises_over_budget(self):
+        with self.assertLogs('foodgram.queries', 'INFO'):
+            with self.assertRaisesMessage(
+                QueryBudgetExceeded, 'RecipeViewSet.list'
+            ):
+                self.client.get(RECIPES_URL)
+
+    @override_settings(QUERY_BUDGET=query_budget(
+        **{'RecipeViewSet.download_shopping_cart': 0}
+    ))
+    def test_streamed_response_counted_when_consumed(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(
+            f'{RECIPES_URL}download_shopping_cart/', {'format': 'txt'}
+        )
+        self.assertTrue(response.streaming)
+        self.assertNotIn('Server-Timing', response)
+        with self.assertLogs('foodgram.queries', 'INFO') as logs:
+            with self.assertRaises(QueryBudgetExceeded):
+                b''.join(response.streaming_content)
+        self.assertEqual(logs.records[0].queries, 1)
+        self.assertEqual(
+            logs.records[0].route, 'RecipeViewSet.download_shopping_cart'
+        )
+
+
+class ShoppingListRendererTest(RecipeFixtureMixin, TestCase):
+
+    def test_base_renderer_is_abstract(self):
+        with self.assertRaises(TypeError):
+            ShoppingListRenderer()
+
+    def test_formats(self):
+        self.client.force_authenticate(self.user)
+        expected = {
+            'txt': 'Список покупок:\n' + ''.join(
+                f'ингредиент {number} - 1 г\n' for number in range(3)
+            ),
+            'csv': 'Ингредиент,Количество,Единица измерения\r\n' + ''.join(
+                f'ингредиент {number},1,г\r\n' for number in range(3)
+            ),
+        }
+        for format, content in expected.items():
+            with self.subTest(format=format):
+                response = self.client.get(
+                    f'{RECIPES_URL}download_shopping_cart/',
+                    {'format': format},
+                )
+                self.assertEqual(
+                    b''.join(response.streaming_content).decode(), content
+                )
+
+
+async def asgi_get(path, query='', headers=()):
+    """Ответ ASGIHandler: статус и тело, собранное из сообщений."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'root_path': '',
+        'query_string': query.encode(), 'headers': [
+            (name.encode(), value.encode()) for name, value in headers
+        ], 'server': ('testserver', 80), 'client': ('127.0.0.1', 1),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await ASGIHandler()(scope, receive, send)
+    body = b''.join(
+        message.get('body', b'') for message in messages
+        if message['type'] == 'http.response.body'
+    )
+    return messages[0]['status'], body
+
+
+class AsgiShoppingListTest(RecipeFixtureMixin, TestCase):
+    """Список покупок под ASGIHandler: тело ответа перебирается в цикле
+    событий, где ORM недоступен."""
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        # Как тестовый клиент: соединения внутри транзакции теста
+        # не закрываются.
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+    @override_settings(SERVER_MODE='asgi')
+    async def test_download(self):
+        status, body = await asgi_get(
+            f'{RECIPES_URL}download_shopping_cart/', 'format=txt',
+            [('authorization', f'Token {self.token.key}')],
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(body.decode(), 'Список покупок:\n' + ''.join(
+            f'ингредиент {number} - 1 г\n' for number in range(3)
+        ))
+
+
+ASYNC_READ_VIEWS = {'ENABLED': True, 'THREADS': 2}
+
+
+def thread_view(request):
+    """Ответ с именем потока и базой чтения, в которых выполнена вьюха."""
+    return SimpleTemplateResponse(engines['django'].from_string(
+        f'{threading.current_thread().name} {read_alias.get()}'
+    ))
+
+
+class AsyncReadViewTest(SimpleTestCase):
+
+    def test_read_actions_only(self):
+        with override_settings(ASYNC_READ_VIEWS=ASYNC_READ_VIEWS):
+            self.assertTrue(asyncio.iscoroutinefunction(
+                TagViewSet.as_view({'get': 'list'})
+            ))
+            self.assertFalse(asyncio.iscoroutinefunction(
+                RecipeViewSet.as_view({'get': 'download_shopping_cart'})
+            ))
+        self.assertFalse(asyncio.iscoroutinefunction(
+            TagViewSet.as_view({'get': 'list'})
+        ))
+
+    @override_settings(ASYNC_READ_VIEWS=ASYNC_READ_VIEWS)
+    async def test_read_in_pool(self):
+        view = async_read_view(thread_view)
+        token = read_alias.set('replica1')
+        try:
+            response = await view(RequestFactory().get('/'))
+        finally:
+            read_alias.reset(token)
+        self.assertTrue(response.is_rendered)
+        thread, alias = response.content.decode().split()
+        self.assertTrue(thread.startswith('api-read'))
+        self.assertEqual(alias, 'replica1')
+
+    async def test_write_as_sync_view(self):
+        response = await async_read_view(thread_view)(
+            RequestFactory().post('/')
+        )
+        response.render()
+        self.assertFalse(response.content.startswith(b'api-read'))
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE)
+class KeysetPaginationTest(RecipeFixtureMixin, TestCase):
+
+    def walk(self, params):
+        """Id рецептов со всех страниц, пройденных по ссылкам next."""
+        response = self.client.get(
+            RECIPES_URL, {**params, 'cursor': '', 'limit': 5}
+        )
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            if response.data['next'] is None:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_walks_all_pages(self):
+        refresh_popularity()
+        all_ids = {recipe.pk for recipe in self.recipes}
+        for ordering in ('', '-pub_date', 'author', '-author', 'name',
+                         '-popularity'):
+            with self.subTest(ordering=ordering):
+                ids = self.walk({'ordering': ordering} if ordering else {})
+                self.assertEqual(len(ids), len(all_ids))
+                self.assertEqual(set(ids), all_ids)
+
+    def test_search_rank(self):
+        ids = self.walk({'search': 'author1'})
+        self.assertEqual(
+            set(ids),
+            {recipe.pk for recipe in self.recipes
+             if recipe.author == self.authors[1]},
+        )
+
+    def test_unsupported_ordering(self):
+        for ordering in ('tags', 'author,-name'):
+            with self.subTest(ordering=ordering):
+                response = self.client.get(
+                    RECIPES_URL, {'ordering': ordering, 'cursor': ''}
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+def image_data(size=(600, 400), format='PNG', color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/{format.lower()};base64,{encoded}'
+
+
+class MediaRootMixin:
+    """Файлы теста пишутся во временный MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+@override_settings(
+    RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE,
+    IMAGE_PIPELINE={'EXECUTOR': 'sync', 'WORKERS': 1},
+)
+class ImagePipelineTest(MediaRootMixin, RecipeFixtureMixin, TestCase):
+
+    def create_recipe(self, name, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(RECIPES_URL, {
+                'name': name,
+                'text': 'Текст',
+                'cooking_time': 5,
+                'tags': [self.tags[0].pk],
+                'ingredients': [{'id': self.ingredients[0].pk, 'amount': 2}],
+                'image': image,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(pk=response.data['id'])
+
+    def test_content_addressed_with_renditions(self):
+        self.client.force_authenticate(self.user)
+        image = image_data()
+        first = self.create_recipe('Первый', image)
+        second = self.create_recipe('Второй', image)
+        # Одинаковое содержимое хранится одним файлом с именем по хэшу.
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^recipes/images/[0-9a-f]{64}\.png$'
+        )
+        self.assertTrue(
+            renditions_ready(first.image.name, first.image.storage)
+        )
+
+        response = self.client.get(f'{RECIPES_URL}{first.pk}/')
+        images = response.data['images']
+        self.assertEqual(
+            set(images), set(rendition_names(first.image.name))
+        )
+        self.assertTrue(images['thumbnail_webp'].endswith(
+            f'{os.path.basename(first.image.name)[:-4]}_thumbnail.webp'
+        ))
+        storage = renditions_storage(first.image.storage)
+        with storage.open(rendition_names(first.image.name)['card']) as file:
+            self.assertEqual(Image.open(file).size, (480, 320))
+
+
+class RecipeValidationTest(RecipeFixtureMixin, TestCase):
+    """Ошибки ингредиентов и тегов возвращаются по позициям в списке."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def post(self, ingredients, tags=None):
+        response = self.client.post(RECIPES_URL, {
+            'name': 'Рецепт с ошибками',
+            'text': 'Текст',
+            'cooking_time': 5,
+            'tags': tags or [self.tags[0].pk],
+            'ingredients': ingredients,
+            'image': image_data(),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(
+            Recipe.objects.filter(name='Рецепт с ошибками').exists()
+        )
+        return response.json()
+
+    def test_ingredient_errors_by_index(self):
+        first, second = (ingredient.pk for ingredient in self.ingredients[:2])
+        errors = self.post([
+            {'id': first, 'amount': 1},
+            {'id': 999999, 'amount': 1},
+            {'id': second, 'amount': 1},
+            {'id': first, 'amount': 2},
+        ])
+        self.assertEqual(errors, {'ingredients': [
+            {},
+            {'id': ['Ингредиент 999999 не найден.']},
+            {},
+            {'id': ['Нельзя дублировать ингредиенты.']},
+        ]})
+
+    def test_ingredient_field_errors_by_index(self):
+        errors = self.post([
+            {'id': self.ingredients[0].pk, 'amount': 1},
+            {'id': self.ingredients[1].pk, 'amount': 0},
+        ])
+        self.assertEqual(list(errors), ['ingredients'])
+        self.assertEqual(errors['ingredients'][0], {})
+        self.assertEqual(list(errors['ingredients'][1]), ['amount'])
+
+    def test_tag_errors_by_index(self):
+        errors = self.post(
+            [{'id': self.ingredients[0].pk, 'amount': 1}],
+            tags=[self.tags[0].pk, 999999, self.tags[1].pk],
+        )
+        self.assertEqual(list(errors), ['tags'])
+        self.assertEqual(list(errors['tags']), ['1'])
+        self.assertIn('999999', errors['tags']['1'][0])
+
+
+@override_settings(IMAGE_PIPELINE={'EXECUTOR': 'sync', 'WORKERS': 1})
+class ImageRenditionErrorsTest(MediaRootMixin, TestCase):
+    """Ошибка обработки оригинала логируется, копии не создаются."""
+
+    def process(self, content):
+        name = default_storage.save('recipes/images/broken.png', ContentFile(
+            content
+        ))
+        callback = mock.Mock()
+        with self.assertLogs('recipes.images', 'ERROR') as logs:
+            schedule_renditions(name, default_storage, callback)
+        callback.assert_not_called()
+        self.assertFalse(renditions_ready(name, default_storage))
+        self.assertIsNotNone(logs.records[0].exc_info)
+        return logs.records[0].exc_info[0]
+
+    def test_decompression_bomb(self):
+        content = base64.b64decode(image_data().split(',', 1)[1])
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 10):
+            error = self.process(content)
+        self.assertIs(error, Image.DecompressionBombError)
+
+    def test_not_an_image(self):
+        self.process(b'not an image')
+
+    def test_unexpected_error(self):
+        content = base64.b64decode(image_data().split(',', 1)[1])
+        with mock.patch.object(
+            ImageOps, 'exif_transpose', side_effect=SyntaxError('plugin')
+        ):
+            error = self.process(content)
+        self.assertIs(error, SyntaxError)
+
+
+class Base64ImageFieldTest(TestCase):
+
+    def decode(self, data):
+        file = Base64ImageField().to_internal_value(data)
+        file.seek(0)
+        return file.name, file.read()
+
+    def noise_png(self):
+        """PNG из шума: base64 длиннее одной части декодирования."""
+        buffer = BytesIO()
+        Image.frombytes('RGB', (200, 200), os.urandom(120000)).save(
+            buffer, 'PNG'
+        )
+        return buffer.getvalue()
+
+    def test_extension_from_detected_format(self):
+        encoded = image_data().split(',', 1)[1]
+        for mime, ext in (('x/y', 'png'), ('jpeg', 'png'), ('png', 'png')):
+            with self.subTest(mime=mime):
+                name, _ = self.decode(f'data:image/{mime};base64,{encoded}')
+                self.assertEqual(name, f'temp.{ext}')
+        name, _ = self.decode(image_data(format='JPEG'))
+        self.assertEqual(name, 'temp.jpg')
+
+    def test_line_wrapped_base64(self):
+        content = self.noise_png()
+        encoded = base64.encodebytes(content).decode()
+        self.assertIn('\n', encoded)
+        self.assertGreater(len(encoded), DECODE_CHUNK_SIZE)
+        name, decoded = self.decode(f'data:image/png;base64,{encoded}')
+        self.assertEqual(name, 'temp.png')
+        self.assertEqual(decoded, content)
+
+    def test_rejects_invalid(self):
+        bmp = image_data(format='BMP')
+        content = self.noise_png()
+        truncated = 'data:image/png;base64,' + base64.b64encode(
+            content[:len(content) // 2]
+        ).decode()
+        garbage = 'data:image/png;base64,' + 'не base64' * 10
+        for data in (bmp, truncated, garbage):
+            with self.subTest(data=data[:30]):
+                with self.assertRaises(ValidationError):
+                    self.decode(data)
+
+
+class RecipeUpdateTest(RecipeFixtureMixin, TestCase):
+
+    def test_update_applies_to_locked_row(self):
+        recipe = self.recipes[0]
+        stale = Recipe.objects.get(pk=recipe.pk)
+        # Изменения, сделанные после загрузки объекта вьюсетом.
+        Recipe.objects.filter(pk=recipe.pk).update(text='Текст соседа')
+        Favorite.objects.create(user=self.authors[1], recipe=recipe)
+        request = APIRequestFactory().patch(RECIPES_URL)
+        request.user = recipe.author
+        serializer = CreateRecipeSerializer(
+            stale,
+            data={
+                'name': 'Новое название',
+                'ingredients': [
+                    {'id': self.ingredients[0].pk, 'amount': 5},
+                    {'id': self.ingredients[1].pk, 'amount': 1},
+                ],
+            },
+            partial=True,
+            context={'request': request},
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.text, 'Текст соседа')
+        self.assertEqual(recipe.favorites_count, 2)
+        self.assertEqual(
+            dict(recipe.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            )),
+            {self.ingredients[0].pk: 5, self.ingredients[1].pk: 1},
+        )
+
+    def test_patch(self):
+        recipe = self.recipes[0]
+        self.client.force_authenticate(recipe.author)
+        response = self.client.patch(
+            f'{RECIPES_URL}{recipe.pk}/',
+            {'name': 'Новое название', 'tags': [self.tags[1].pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['name'], 'Новое название')
+        self.assertEqual(response.data['tags'], [self.tags[1].pk])
+
+
+class RecipeResponseCacheTest(RecipeFixtureMixin, TestCase):
+
+    def test_cached_retrieve(self):
+        url = f'{RECIPES_URL}{self.recipes[0].pk}/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        Recipe.objects.filter(pk=self.recipes[0].pk).first().save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_invalid_pk_creates_no_version(self):
+        response = self.client.get(f'{RECIPES_URL}abc/')
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(cache.get(recipe_version_key('abc')))
+
+    def test_recipe_versions_expire(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            response = self.client.get(f'{RECIPES_URL}999999/')
+        self.assertEqual(response.status_code, 404)
+        add.assert_any_call(
+            recipe_version_key(999999), mock.ANY,
+            timeout=RECIPE_VERSION_TIMEOUT,
+        )
@@ -1,18 +1,20 @@
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.response import Response
 
 from recipes.models import Recipe
 
 
 class PostDeleteMixin:
+    @transaction.atomic
     def post_delete(self, model, model_serializer, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
         user = self.request.user
 
         if request.method == 'POST':
             if model.objects.filter(recipe=recipe, user=user).exists():
-                raise Response(
+                return Response(
                     {'errors': 'Рецепт уже добавлен'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
@@ -27,6 +29,23 @@ class PostDeleteMixin:
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def get_recipes_limit(request):
+    """Возвращает параметр recipes_limit запроса или None."""
+    limit = request.query_params.get('recipes_limit')
+    if not limit:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Укажите целое положительное число.'}
+        )
+    return limit
+
+
+@transaction.atomic
 def subscrib_post(request, id, model, model_user, serializer):
     """Создает подписку на автора."""
 
@@ -49,6 +68,7 @@ def subscrib_post(request, id, model, model_user, serializer):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@transaction.atomic
 def subscrib_delete(request, pk, model, model_user):
     """Удаляет подписку на автора."""
 
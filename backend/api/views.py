@@ -1,54 +1,131 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, status, viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, RecipeFilter
+from api.async_views import AsyncReadMixin
+from api.cache import RecipeResponseCacheMixin
+from api.filters import (IngredientFilter, RecipeFilter,
+                         RecipeOrderingFilter, with_popularity)
 from api.pagination import CustomPagination
 from api.permissions import AuthorOrAdminOrReadOnly
+from api.renderers import SHOPPING_LIST_RENDERERS
 from api.serializers import (CreateRecipeSerializer, IngredientSerializer,
                              RecipeSerializer, ShortRecipeSerializer,
                              TagSerializer)
 from api.utils import PostDeleteMixin
+from recipes.catalog import get_ingredient_catalog, get_tag_registry
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    """Вьюсет для модели Ingredient."""
+class IngredientViewSet(AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Вьюсет для модели Ingredient.
+    При INGREDIENT_CATALOG_ENABLED отдает данные из справочника
+    в памяти процесса, не обращаясь к базе.
+    """
 
     queryset = Ingredient.objects.all()
     permission_classes = [AllowAny, ]
     serializer_class = IngredientSerializer
     filter_backends = [DjangoFilterBackend, ]
     filterset_class = IngredientFilter
-    search_fields = ['^name', ]
+
+    def list(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_CATALOG_ENABLED:
+            return super().list(request, *args, **kwargs)
+        catalog = get_ingredient_catalog()
+        name = request.query_params.get('name')
+        ingredients = catalog.search(name) if name else catalog.ingredients
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_CATALOG_ENABLED:
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise NotFound
+        ingredient = get_ingredient_catalog().get(pk)
+        if ingredient is None:
+            raise NotFound
+        return Response(self.get_serializer(ingredient).data)
+
+
+def tags_etag(request, *args, **kwargs):
+    return get_tag_registry().etag
+
+
+def tags_last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(
+        get_tag_registry().last_modified, tz=timezone.utc
+    )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
-    """Вьюсет для модели Tag."""
+@method_decorator(
+    [
+        condition(etag_func=tags_etag, last_modified_func=tags_last_modified),
+        cache_control(public=True, max_age=settings.TAGS_CACHE_MAX_AGE),
+    ],
+    name='dispatch',
+)
+class TagViewSet(AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Вьюсет для модели Tag.
+    Данные берутся из справочника тегов в памяти процесса, ответы
+    снабжаются ETag и Last-Modified для условных запросов.
+    """
 
     permission_classes = [AllowAny, ]
     pagination_class = None
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(get_tag_registry().tags, many=True)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            tag = get_tag_registry().get(int(kwargs[self.lookup_field]))
+        except ValueError:
+            tag = None
+        if tag is None:
+            raise NotFound
+        return Response(self.get_serializer(tag).data)
+
 
 class RecipeViewSet(
+    AsyncReadMixin,
+    RecipeResponseCacheMixin,
     viewsets.ModelViewSet,
     PostDeleteMixin
 ):
     """Вьюсет для модели Recipe."""
 
-    queryset = Recipe.objects.all()
     permission_classes = [AuthorOrAdminOrReadOnly, ]
     pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RecipeOrderingFilter]
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        # Поисковый вектор нужен только в условиях запроса.
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        ).defer('search_vector')
+
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH', 'DELETE'):
             return CreateRecipeSerializer
@@ -62,6 +139,7 @@ class RecipeViewSet(
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         self.perform_destroy(self.get_object())
         return Response(
@@ -93,30 +171,61 @@ class RecipeViewSet(
             pk,
         )
 
+    @action(
+        detail=False,
+        methods=['GET'],
+    )
+    def popular(self, request):
+        """Рецепты по убыванию популярности с учетом фильтров."""
+        queryset = with_popularity(
+            self.filter_queryset(self.get_queryset())
+        ).order_by('-popularity', '-id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated, ],
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок пользователя, новые первыми."""
+        queryset = self.filter_queryset(self.get_queryset()).feed(
+            request.user
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         methods=['GET'],
         url_path='download_shopping_cart',
-        permission_classes=[IsAuthenticated, ]
+        permission_classes=[IsAuthenticated, ],
+        renderer_classes=SHOPPING_LIST_RENDERERS,
     )
     def download_shopping_cart(self, request):
-        ingredient_list = "Cписок покупок:"
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__is_in_shopping_cart__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount_sum=Sum('amount'))
-        for num, i in enumerate(ingredients):
-            ingredient_list += (
-                f"\n{i['ingredient__name']} - "
-                f"{i['amount_sum']} {i['ingredient__measurement_unit']}"
-            )
-            if num < ingredients.count() - 1:
-                ingredient_list += ', '
-        file = 'shopping_list'
-        response = HttpResponse(
-            ingredient_list,
-            'Content-Type: application/pdf'
+        """
+        Отдает список покупок в формате txt, csv или pdf (?format=).
+        Суммы ингредиентов считаются одним агрегирующим запросом.
+        """
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        ingredients = RecipeIngredient.objects.shopping_list(request.user)
+        if settings.SERVER_MODE == 'asgi':
+            # ASGIHandler перебирает тело ответа в цикле событий, где
+            # ORM недоступен, поэтому строки читаются здесь, в потоке вьюхи.
+            rows = list(ingredients)
+        else:
+            rows = ingredients.iterator()
+        response = StreamingHttpResponse(
+            renderer.stream(rows),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
-        response['Content-Disposition'] = f'attachment; filename="{file}.pdf"'
         return response
@@ -0,0 +1,96 @@
+"""
+Метрики соединений с базой: число открытий и время выдачи соединения.
+
+Счетчики копятся в памяти процесса и раз в DB_METRICS['FLUSH_INTERVAL']
+секунд прибавляются к счетчикам в кэше Django, общим для всех воркеров.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+METRICS_KEY = 'db_connection_metrics:{alias}:{name}'
+STARTED_KEY = 'db_connection_metrics:started'
+# Верхние границы корзин гистограммы времени выдачи соединения, мс.
+CHECKOUT_BUCKETS = (1, 5, 10, 50, 100, 500, None)
+COUNTERS = ('opens', 'open_us', 'checkouts', 'checkout_us')
+
+_pending = defaultdict(int)
+_pending_lock = threading.Lock()
+_flushed_at = 0.0
+
+
+def bucket_name(bound):
+    return f'checkout_le_{bound or "inf"}'
+
+
+def counter_names():
+    return COUNTERS + tuple(bucket_name(bound) for bound in CHECKOUT_BUCKETS)
+
+
+def add(alias, values):
+    global _flushed_at
+    if not settings.DB_METRICS['ENABLED']:
+        return
+    now = time.monotonic()
+    with _pending_lock:
+        for name, value in values.items():
+            _pending[alias, name] += value
+        if now - _flushed_at < settings.DB_METRICS['FLUSH_INTERVAL']:
+            return
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed_at = now
+    flush(pending)
+
+
+def flush(pending):
+    cache.add(STARTED_KEY, time.time(), timeout=None)
+    for (alias, name), value in pending.items():
+        key = METRICS_KEY.format(alias=alias, name=name)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            # Счетчик вытеснен из кэша между add и incr.
+            pass
+
+
+def record_open(alias, duration):
+    add(alias, {'opens': 1, 'open_us': int(duration * 1_000_000)})
+
+
+def record_checkout(alias, duration):
+    milliseconds = duration * 1000
+    bound = next(
+        bound for bound in CHECKOUT_BUCKETS
+        if bound is None or milliseconds <= bound
+    )
+    add(alias, {
+        'checkouts': 1,
+        'checkout_us': int(duration * 1_000_000),
+        bucket_name(bound): 1,
+    })
+
+
+def get_stats(alias):
+    keys = {
+        name: METRICS_KEY.format(alias=alias, name=name)
+        for name in counter_names()
+    }
+    values = cache.get_many(keys.values())
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
+
+def get_started():
+    return cache.get(STARTED_KEY)
+
+
+def reset(aliases):
+    cache.delete_many([STARTED_KEY] + [
+        METRICS_KEY.format(alias=alias, name=name)
+        for alias in aliases
+        for name in counter_names()
+    ])
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """
+    RunSQL только для одной СУБД (vendor соединения, например
+    postgresql) или, при exclude=True, для всех остальных.
+    """
+
+    def __init__(self, vendor, *args, exclude=False, **kwargs):
+        self.vendor = vendor
+        self.exclude = exclude
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        kwargs['vendor'] = self.vendor
+        if self.exclude:
+            kwargs['exclude'] = True
+        return name, args, kwargs
+
+    def applies_to(self, schema_editor):
+        return (schema_editor.connection.vendor == self.vendor) != (
+            self.exclude
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if self.applies_to(schema_editor):
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if self.applies_to(schema_editor):
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
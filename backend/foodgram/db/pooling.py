@@ -0,0 +1,68 @@
+import time
+
+from foodgram.db import metrics
+
+
+class ConnectionPoolingMixin:
+    """
+    Примесь к DatabaseWrapper стандартного бэкенда.
+
+    Считает открытия соединений и время выдачи соединения запросу
+    (первый курсор или транзакция после начала запроса) и проверяет
+    постоянное соединение перед повторным использованием, если в настройках
+    базы включен CONN_HEALTH_CHECKS (в Django 3.2 этой настройки еще нет).
+    """
+
+    health_check_done = False
+    checked_out = False
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        metrics.record_open(self.alias, time.perf_counter() - start)
+        # Только что открытое соединение проверять не нужно.
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Вызывается в начале и в конце каждого запроса.
+        self.health_check_done = False
+        self.checked_out = False
+
+    def close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or self.health_check_done
+            or not self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def check_out(self):
+        """Первое обращение запроса к соединению: проверка соединения
+        и при необходимости подключение."""
+        if self.checked_out:
+            return
+        start = time.perf_counter()
+        self.close_if_health_check_failed()
+        self.ensure_connection()
+        self.checked_out = True
+        metrics.record_checkout(self.alias, time.perf_counter() - start)
+
+    def set_autocommit(
+        self, autocommit, force_begin_transaction_with_broken_autocommit=False
+    ):
+        # Запрос может начать работу с базой не с курсора, а с транзакции
+        # (atomic()), поэтому соединение проверяется и здесь, как в
+        # Django 4.1.
+        self.validate_no_atomic_block()
+        self.check_out()
+        super().set_autocommit(
+            autocommit, force_begin_transaction_with_broken_autocommit
+        )
+
+    def _cursor(self, name=None):
+        self.check_out()
+        return super()._cursor(name)
@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from foodgram.db.pooling import ConnectionPoolingMixin
+
+
+class DatabaseWrapper(ConnectionPoolingMixin, base.DatabaseWrapper):
+    pass
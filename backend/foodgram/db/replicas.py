@@ -0,0 +1,210 @@
+"""
+Чтение с реплик базы.
+
+Middleware выбирает для безопасных запросов (GET, HEAD, OPTIONS) живую
+реплику, и роутер направляет на нее чтение. Запись и все запросы
+пользователя в течение DB_REPLICA['STICKY_SECONDS'] после успешной записи
+идут в основную базу, чтобы пользователь видел свои изменения.
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('foodgram.db')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'db_primary'
+PIN_KEY = 'db_primary:{}'
+# Модели, которые всегда читаются из основной базы: выход из системы
+# должен сразу запрещать доступ по токену.
+PRIMARY_MODELS = ('authtoken.token', 'authtoken.tokenproxy')
+
+POSTGRES_LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM '
+    'now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+read_alias = contextvars.ContextVar('db_read_alias', default=None)
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+@contextmanager
+def use_primary():
+    """
+    Читает из основной базы внутри блока. Нужен там, где прочитанные
+    данные кэшируются под новой версией и не должны отставать от записи.
+    """
+    token = read_alias.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+class ReplicaHealth:
+    """
+    Состояние реплик в процессе: доступность и отставание проверяются
+    не чаще раза в DB_REPLICA['CHECK_INTERVAL'] секунд.
+    """
+
+    def __init__(self):
+        self.checked = {}
+        self.lock = threading.Lock()
+
+    def is_stale(self, alias):
+        _, checked_at = self.checked.get(alias, (False, 0))
+        interval = settings.DB_REPLICA['CHECK_INTERVAL']
+        return time.monotonic() - checked_at >= interval
+
+    def is_healthy(self, alias):
+        return self.checked.get(alias, (False, 0))[0]
+
+    def get_lag(self, alias):
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor != 'postgresql':
+                cursor.execute('SELECT 1')
+                return 0
+            cursor.execute(POSTGRES_LAG_SQL)
+            return float(cursor.fetchone()[0])
+
+    def check(self, alias):
+        try:
+            lag = self.get_lag(alias)
+        except DatabaseError as error:
+            logger.warning('Реплика %s недоступна: %r', alias, error)
+            connections[alias].close()
+            healthy = False
+        else:
+            healthy = lag <= settings.DB_REPLICA['MAX_LAG']
+            if not healthy:
+                logger.warning('Реплика %s отстает на %.1f с', alias, lag)
+        with self.lock:
+            self.checked[alias] = (healthy, time.monotonic())
+
+    def mark_down(self, alias):
+        with self.lock:
+            self.checked[alias] = (False, time.monotonic())
+
+    def choose(self, replicas):
+        for alias in replicas:
+            if self.is_stale(alias):
+                self.check(alias)
+        healthy = [alias for alias in replicas if self.is_healthy(alias)]
+        return random.choice(healthy) if healthy else None
+
+
+health = ReplicaHealth()
+
+
+def pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    digest = hashlib.sha1(authorization.encode()).hexdigest()
+    return PIN_KEY.format(digest)
+
+
+def is_pinned(request):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    key = pin_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+def pin(request, response):
+    """После записи запросы пользователя временно идут в основную базу:
+    по cookie для браузера и по заголовку Authorization для API."""
+    seconds = settings.DB_REPLICA['STICKY_SECONDS']
+    key = pin_key(request)
+    if key is not None:
+        cache.set(key, 1, timeout=seconds)
+    response.set_cookie(
+        PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax'
+    )
+
+
+class ReplicaRouter:
+    """Направляет чтение в реплику, выбранную для текущего запроса."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтения и закрепляет пользователя за основной
+    базой после записи."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def choose_alias(self, request):
+        if request.method not in SAFE_METHODS or is_pinned(request):
+            return None
+        return health.choose(get_replicas())
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin(request, response)
+        return response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        request.db_read_alias = self.choose_alias(request)
+        token = read_alias.set(request.db_read_alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        request.db_read_alias = await sync_to_async(self.choose_alias)(
+            request
+        )
+        token = read_alias.set(request.db_read_alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        return await sync_to_async(self.finish)(request, response)
+
+    def process_exception(self, request, exception):
+        alias = getattr(request, 'db_read_alias', None)
+        if alias is not None and isinstance(exception, DatabaseError):
+            logger.warning('Ошибка реплики %s: %r', alias, exception)
+            health.mark_down(alias)
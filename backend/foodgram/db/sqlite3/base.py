@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3 import base
+
+from foodgram.db.pooling import ConnectionPoolingMixin
+
+
+class DatabaseWrapper(ConnectionPoolingMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,21 @@
+import json
+import logging
+
+# Стандартные атрибуты записи лога; остальные переданы через extra.
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    'message', 'asctime',
+}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Дописывает к строке лога поля из extra в виде JSON."""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {
+            name: value for name, value in vars(record).items()
+            if name not in RECORD_ATTRIBUTES
+        }
+        if not fields:
+            return line
+        return f'{line} {json.dumps(fields, ensure_ascii=False, default=str)}'
@@ -39,6 +39,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.db.replicas.ReplicaMiddleware',
+    'api.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -60,18 +62,80 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# Режим сервера: wsgi - синхронные воркеры gunicorn, asgi - воркеры
+# uvicorn под gunicorn (см. gunicorn.conf.py).
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
+# Обертки стандартных бэкендов с метриками соединений и проверкой
+# постоянных соединений (CONN_HEALTH_CHECKS).
+DATABASE_BACKENDS = {
+    'django.db.backends.postgresql': 'foodgram.db.postgresql',
+    'django.db.backends.sqlite3': 'foodgram.db.sqlite3',
+}
+DATABASE_ENGINE = os.getenv('ENGINE', default='django.db.backends.postgresql')
+
+# PgBouncer в режиме transaction pooling: серверные курсоры недоступны.
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', default='False') == 'True'
 
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('ENGINE', default='django.db.backends.postgresql'),
+        'ENGINE': DATABASE_BACKENDS.get(DATABASE_ENGINE, DATABASE_ENGINE),
         'NAME': os.getenv('DB_NAME', default='postgres'),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default=5432)
+        'PORT': os.getenv('DB_PORT', default=5432),
+        # Время жизни соединения, с. В режиме asgi потоки запросов
+        # не переиспользуются, поэтому по умолчанию соединения закрываются
+        # после каждого запроса.
+        'CONN_MAX_AGE': int(os.getenv(
+            'CONN_MAX_AGE', default=0 if SERVER_MODE == 'asgi' else 60
+        )),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'CONN_HEALTH_CHECKS', default='True'
+        ) == 'True',
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
     }
 }
 
+
+def replica_settings(address):
+    """Настройки реплики: адрес host[:port], для SQLite - путь к файлу."""
+    replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DATABASE_ENGINE == 'django.db.backends.sqlite3':
+        replica['NAME'] = address
+    else:
+        host, _, port = address.partition(':')
+        replica.update(HOST=host, PORT=port or replica['PORT'])
+    return replica
+
+
+# Реплики для чтения через запятую, например DB_REPLICAS=replica1,replica2.
+DATABASES.update({
+    f'replica{number}': replica_settings(address.strip())
+    for number, address in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(',')),
+        start=1,
+    )
+})
+DATABASE_ROUTERS = ['foodgram.db.replicas.ReplicaRouter']
+
+DB_REPLICA = {
+    # Сколько секунд после записи пользователь читает из основной базы.
+    'STICKY_SECONDS': int(os.getenv('DB_REPLICA_STICKY_SECONDS', default=10)),
+    # Реплика с большим отставанием, с, не используется.
+    'MAX_LAG': float(os.getenv('DB_REPLICA_MAX_LAG', default=5)),
+    'CHECK_INTERVAL': 5,
+}
+
+DB_METRICS = {
+    'ENABLED': os.getenv('DB_METRICS_ENABLED', default='True') == 'True',
+    # Как часто счетчики процесса переносятся в общий кэш, с.
+    'FLUSH_INTERVAL': int(os.getenv('DB_METRICS_FLUSH_INTERVAL', default=10)),
+}
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 
@@ -111,7 +175,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_FILTER_BACKENDS': [
@@ -134,6 +198,131 @@ DJOSER = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+# Кэши, которые не видны другим воркерам.
+PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SHARED_CACHE = CACHES['default']['BACKEND'] not in PROCESS_CACHE_BACKENDS
+
+INGREDIENT_CATALOG_ENABLED = os.getenv(
+    'INGREDIENT_CATALOG_ENABLED', default='True'
+) == 'True'
+
+TAGS_CACHE_MAX_AGE = int(os.getenv('TAGS_CACHE_MAX_AGE', default=60))
+
+# Лента подписок: join - выборка по подпискам при чтении (небольшие
+# установки), timeline - готовые ленты, заполняемые при публикации рецепта.
+RECIPE_FEED_STRATEGY = os.getenv('RECIPE_FEED_STRATEGY', default='join')
+
+# Ограничения для картинок, загружаемых строкой base64.
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', default=10 * 1024 * 1024)
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv('IMAGE_UPLOAD_MAX_PIXELS', default=40_000_000)
+)
+
+IMAGE_PIPELINE = {
+    # thread - пул потоков процесса, sync - обработка в потоке запроса.
+    'EXECUTOR': os.getenv('IMAGE_PIPELINE_EXECUTOR', default='thread'),
+    'WORKERS': int(os.getenv('IMAGE_PIPELINE_WORKERS', default=2)),
+}
+
+
+# Признаки избранного, покупок и подписок из множеств id пользователя
+# в памяти процесса вместо подзапросов.
+USER_STATE_ENABLED = os.getenv('USER_STATE_ENABLED', default='True') == 'True'
+
+# Кэш токенов: пользователь по токену без запроса к базе. Выход и
+# деактивация сбрасывают его через общий кэш, поэтому по умолчанию он
+# включен только с общим для воркеров кэшем.
+TOKEN_AUTH_CACHE = {
+    'ENABLED': os.getenv(
+        'TOKEN_AUTH_CACHE_ENABLED', default=str(SHARED_CACHE)
+    ) == 'True',
+    'TIMEOUT': int(os.getenv('TOKEN_AUTH_CACHE_TIMEOUT', default=60)),
+}
+
+# Кэш ответов списка и страницы рецепта для анонимных пользователей.
+RECIPE_RESPONSE_CACHE = {
+    'ENABLED': os.getenv(
+        'RECIPE_RESPONSE_CACHE_ENABLED', default='True'
+    ) == 'True',
+    'TIMEOUT': int(os.getenv('RECIPE_RESPONSE_CACHE_TIMEOUT', default=300)),
+    # Время жизни блокировки пересчета и ожидание чужого пересчета, с.
+    'LOCK_TIMEOUT': 10,
+    'LOCK_WAIT': 2,
+}
+
+# В режиме asgi чтение рецептов, тегов и ингредиентов идет асинхронными
+# вьюхами через пул из THREADS потоков на воркер.
+ASYNC_READ_VIEWS = {
+    'ENABLED': SERVER_MODE == 'asgi',
+    'THREADS': int(os.getenv('ASYNC_READ_THREADS', default=8)),
+}
+
+
+QUERY_BUDGET = {
+    'ENABLED': os.getenv('QUERY_BUDGET_ENABLED', default='False') == 'True',
+    'RAISE': os.getenv('QUERY_BUDGET_RAISE', default='False') == 'True',
+    'DEFAULT': int(os.getenv('QUERY_BUDGET_DEFAULT', default=20)),
+    'SLOWEST': 3,
+    'ROUTES': {
+        'RecipeViewSet.list': 8,
+        'RecipeViewSet.retrieve': 8,
+        'IngredientViewSet.list': 3,
+        'TagViewSet.list': 3,
+        'SubscribeView.list': 4,
+        'SubscribeView.subscriptions': 8,
+    },
+}
+
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        # Поля из extra (маршрут, число запросов, медленные запросы)
+        # дописываются к строке в виде JSON.
+        'structured': {
+            '()': 'foodgram.logs.StructuredFormatter',
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'structured',
+        },
+    },
+    'loggers': {
+        'foodgram': {
+            'handlers': ['console'],
+            'level': os.getenv('LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+SHOPPING_LIST_PDF_SPOOL_SIZE = 1024 * 1024
+
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
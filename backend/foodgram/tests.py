@@ -0,0 +1,211 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from rest_framework.authtoken.models import Token
+
+from foodgram.db import replicas
+from foodgram.db.sqlite3.base import DatabaseWrapper
+from recipes.models import Recipe
+
+REPLICA = 'replica1'
+
+
+class ConnectionHealthCheckTest(SimpleTestCase):
+    """Постоянное соединение проверяется при первом обращении запроса."""
+
+    def setUp(self):
+        handle, name = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, name)
+        self.connection = DatabaseWrapper(
+            dict(connection.settings_dict, NAME=name, CONN_HEALTH_CHECKS=True),
+            alias='health_check',
+        )
+        self.addCleanup(self.connection.close)
+        self.connection.ensure_connection()
+        # Начало следующего HTTP-запроса.
+        self.connection.close_if_unusable_or_obsolete()
+        self.stale = self.connection.connection
+
+    def assert_reconnected(self, use):
+        with mock.patch.object(
+            self.connection, 'is_usable', return_value=False
+        ) as is_usable:
+            use()
+        is_usable.assert_called_once_with()
+        self.assertIsNot(self.connection.connection, self.stale)
+
+    def test_transaction_first(self):
+        def begin():
+            self.connection.set_autocommit(False)
+            self.connection.rollback()
+            self.connection.set_autocommit(True)
+
+        self.assert_reconnected(begin)
+
+    def test_cursor_first(self):
+        def query():
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+        self.assert_reconnected(query)
+
+    def test_checked_once_per_request(self):
+        with mock.patch.object(
+            self.connection, 'is_usable', return_value=True
+        ) as is_usable:
+            self.connection.set_autocommit(False)
+            self.connection.set_autocommit(True)
+            with self.connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        is_usable.assert_called_once_with()
+        self.assertIs(self.connection.connection, self.stale)
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    """Чтение идет в базу, выбранную для запроса, запись - в основную."""
+
+    def setUp(self):
+        token = replicas.read_alias.set(REPLICA)
+        self.addCleanup(replicas.read_alias.reset, token)
+
+    def test_read_from_chosen_replica(self):
+        self.assertEqual(Recipe.objects.all().db, REPLICA)
+
+    def test_write_to_primary(self):
+        self.assertEqual(
+            Recipe.objects.select_for_update().db, DEFAULT_DB_ALIAS
+        )
+
+    def test_tokens_from_primary(self):
+        self.assertEqual(Token.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_use_primary(self):
+        with replicas.use_primary():
+            self.assertEqual(Recipe.objects.all().db, DEFAULT_DB_ALIAS)
+        self.assertEqual(Recipe.objects.all().db, REPLICA)
+
+    def test_migrate_primary_only(self):
+        router = replicas.ReplicaRouter()
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'recipes'))
+        self.assertFalse(router.allow_migrate(REPLICA, 'recipes'))
+
+
+class ReplicaHealthTest(SimpleTestCase):
+    """Отстающая или недоступная реплика не выбирается."""
+
+    def setUp(self):
+        self.health = replicas.ReplicaHealth()
+
+    def choose(self, **lag):
+        with mock.patch.object(self.health, 'get_lag', **lag) as get_lag:
+            alias = self.health.choose([REPLICA])
+        return alias, get_lag
+
+    def test_healthy(self):
+        alias, _ = self.choose(return_value=0)
+        self.assertEqual(alias, REPLICA)
+
+    def test_lagging(self):
+        with self.settings(DB_REPLICA={'MAX_LAG': 5, 'CHECK_INTERVAL': 5}):
+            with self.assertLogs('foodgram.db', 'WARNING'):
+                alias, _ = self.choose(return_value=6)
+        self.assertIsNone(alias)
+
+    def test_down(self):
+        with mock.patch.object(replicas, 'connections') as connections:
+            with self.assertLogs('foodgram.db', 'WARNING'):
+                alias, _ = self.choose(side_effect=DatabaseError)
+        self.assertIsNone(alias)
+        connections[REPLICA].close.assert_called_once_with()
+
+    def test_checked_once_per_interval(self):
+        self.choose(return_value=0)
+        alias, get_lag = self.choose(return_value=0)
+        self.assertEqual(alias, REPLICA)
+        get_lag.assert_not_called()
+
+    def test_mark_down(self):
+        self.choose(return_value=0)
+        self.health.mark_down(REPLICA)
+        alias, get_lag = self.choose(return_value=0)
+        self.assertIsNone(alias)
+        get_lag.assert_not_called()
+
+
+class ReplicaMiddlewareTest(SimpleTestCase):
+    """Безопасные запросы читают с реплики, после записи пользователь
+    на время закреплен за основной базой."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.status = 200
+        patcher = mock.patch.object(
+            replicas, 'get_replicas', return_value=[REPLICA]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            replicas.health, 'choose', return_value=REPLICA
+        )
+        self.choose = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = replicas.ReplicaMiddleware(self.get_response)
+
+    def get_response(self, request):
+        self.read_from = replicas.read_alias.get()
+        return HttpResponse(status=self.status)
+
+    def call(self, method, **extra):
+        request = getattr(self.factory, method)('/api/recipes/', **extra)
+        return self.middleware(request)
+
+    def test_safe_method_reads_replica(self):
+        self.call('get')
+        self.assertEqual(self.read_from, REPLICA)
+        self.assertIsNone(replicas.read_alias.get())
+
+    def test_write_pins_to_primary(self):
+        auth = {'HTTP_AUTHORIZATION': 'Token secret'}
+        response = self.call('post', **auth)
+        self.assertIsNone(self.read_from)
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        self.call('get', **auth)
+        self.assertIsNone(self.read_from)
+        self.call('get', HTTP_AUTHORIZATION='Token other')
+        self.assertEqual(self.read_from, REPLICA)
+
+    def test_pin_cookie(self):
+        self.factory.cookies[replicas.PIN_COOKIE] = '1'
+        self.call('get')
+        self.assertIsNone(self.read_from)
+
+    def test_failed_write_not_pinned(self):
+        self.status = 400
+        response = self.call('post')
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_no_healthy_replica(self):
+        self.choose.return_value = None
+        self.call('get')
+        self.assertIsNone(self.read_from)
+
+    def test_replica_error_marks_down(self):
+        request = self.factory.get('/api/recipes/')
+        request.db_read_alias = REPLICA
+        with mock.patch.object(replicas.health, 'mark_down') as mark_down:
+            with self.assertLogs('foodgram.db', 'WARNING'):
+                self.middleware.process_exception(request, DatabaseError())
+        mark_down.assert_called_once_with(REPLICA)
+
+    def test_not_used_without_replicas(self):
+        replicas.get_replicas.return_value = []
+        with self.assertRaises(MiddlewareNotUsed):
+            replicas.ReplicaMiddleware(self.get_response)
@@ -0,0 +1,9 @@
+import os
+
+# Приложение выбирается в Dockerfile: foodgram.wsgi или foodgram.asgi
+# по той же переменной SERVER_MODE.
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
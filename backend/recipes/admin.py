@@ -1,4 +1,5 @@
-from django.contrib.admin import ModelAdmin, StackedInline, register
+from django.contrib.admin import (ModelAdmin, StackedInline, display,
+                                  register)
 
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
@@ -42,8 +43,9 @@ class RecipeAdmin(ModelAdmin):
     ]
     inlines = (IngredientsInLine, )
 
+    @display(description='В избранном', ordering='favorites_count')
     def is_favorited_count(self, obj):
-        return obj.is_favorited.count()
+        return obj.favorites_count
 
 
 @register(Favorite)
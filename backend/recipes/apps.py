@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db import DatabaseError
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        import recipes.signals  # noqa: F401
+        from recipes.catalog import get_tag_registry
+
+        try:
+            get_tag_registry()
+        except DatabaseError:
+            # База еще не доступна или не мигрирована (например, при
+            # выполнении migrate): справочник загрузится при первом запросе.
+            pass
@@ -0,0 +1,199 @@
+import bisect
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram.db.replicas import use_primary
+from recipes.models import Ingredient, Tag
+
+INGREDIENT_CATALOG_VERSION_KEY = 'ingredient_catalog_version'
+TAG_REGISTRY_VERSION_KEY = 'tag_registry_version'
+RECIPE_LIST_VERSION_KEY = 'recipe_list_version'
+RECIPE_AUTHORS_VERSION_KEY = 'recipe_authors_version'
+RECIPE_VERSION_KEY = 'recipe_version:{}'
+# Версии отдельных рецептов создаются по id из запросов, поэтому хранятся
+# ограниченное время; истекшая версия создается заново.
+RECIPE_VERSION_TIMEOUT = 24 * 60 * 60
+
+
+def version_timeout(key):
+    if key.startswith(RECIPE_VERSION_KEY.format('')):
+        return RECIPE_VERSION_TIMEOUT
+    return None
+
+
+def get_version(key):
+    """
+    Возвращает версию данных из общего кэша, при отсутствии создает ее.
+    Версия - время последнего изменения данных; общий кэш (Redis,
+    memcached) делает ее единой для всех воркеров.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), timeout=version_timeout(key))
+        version = cache.get(key)
+    return version
+
+
+def get_versions(keys):
+    """Версии нескольких ключей за одно обращение к кэшу."""
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, timeout=version_timeout(key))
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]
+
+
+def set_version(key):
+    cache.set(key, time.time(), timeout=version_timeout(key))
+
+
+def bump_version(key):
+    """
+    Меняет версию данных сразу и повторно после фиксации транзакции:
+    процесс, успевший перечитать незафиксированное состояние,
+    перечитает данные еще раз.
+    """
+    set_version(key)
+    transaction.on_commit(lambda: set_version(key))
+
+
+class VersionedCache:
+    """
+    Данные, загруженные один раз на процесс и перечитываемые из базы
+    только после смены версии в общем кэше. Читаются из основной базы:
+    реплика может еще не содержать изменение, сменившее версию.
+    """
+
+    def __init__(self, key, build):
+        self.key = key
+        self.build = build
+        self.value = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        version = get_version(self.key)
+        value = self.value
+        if value is None or value.version != version:
+            with self.lock:
+                if self.value is None or self.value.version != version:
+                    with use_primary():
+                        self.value = self.build(version)
+                value = self.value
+        return value
+
+    def invalidate(self):
+        bump_version(self.key)
+
+
+class IngredientCatalog:
+    """Неизменяемый индекс ингредиентов, отсортированный по названию."""
+
+    def __init__(self, ingredients, version):
+        self.version = version
+        self.ingredients = tuple(sorted(
+            ingredients,
+            key=lambda ingredient: (ingredient.name.casefold(), ingredient.pk),
+        ))
+        self.keys = [
+            ingredient.name.casefold() for ingredient in self.ingredients
+        ]
+        self.by_id = {
+            ingredient.pk: ingredient for ingredient in self.ingredients
+        }
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def in_bulk(self, pks):
+        """Как QuerySet.in_bulk: найденные ингредиенты по id."""
+        return {pk: self.by_id[pk] for pk in pks if pk in self.by_id}
+
+    def search(self, value):
+        """
+        Ищет ингредиенты по части названия без учета регистра:
+        сначала найденные бинарным поиском совпадения по началу
+        названия, затем остальные совпадения по подстроке.
+        """
+        key = value.casefold()
+        start = bisect.bisect_left(self.keys, key)
+        end = bisect.bisect_left(self.keys, key + chr(0x10FFFF), lo=start)
+        substring_matches = tuple(
+            ingredient
+            for name, ingredient in zip(self.keys, self.ingredients)
+            if key in name and not name.startswith(key)
+        )
+        return self.ingredients[start:end] + substring_matches
+
+
+class TagRegistry:
+    """Неизменяемый справочник тегов с индексами по id и слагу."""
+
+    def __init__(self, tags, version):
+        self.version = version
+        self.tags = tuple(sorted(tags, key=lambda tag: tag.pk))
+        self.by_id = {tag.pk: tag for tag in self.tags}
+        self.by_slug = {tag.slug: tag for tag in self.tags}
+        self.etag = hashlib.sha1(repr([
+            (tag.pk, tag.name, tag.color, tag.slug) for tag in self.tags
+        ]).encode()).hexdigest()
+
+    @property
+    def last_modified(self):
+        return self.version
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def slug_choices(self):
+        return [(tag.slug, tag.name) for tag in self.tags]
+
+
+ingredient_catalog = VersionedCache(
+    INGREDIENT_CATALOG_VERSION_KEY,
+    lambda version: IngredientCatalog(Ingredient.objects.all(), version),
+)
+tag_registry = VersionedCache(
+    TAG_REGISTRY_VERSION_KEY,
+    lambda version: TagRegistry(Tag.objects.all(), version),
+)
+
+
+def get_ingredient_catalog():
+    return ingredient_catalog.get()
+
+
+def invalidate_ingredient_catalog():
+    ingredient_catalog.invalidate()
+
+
+def get_tag_registry():
+    return tag_registry.get()
+
+
+def invalidate_tag_registry():
+    tag_registry.invalidate()
+
+
+def recipe_version_key(pk):
+    return RECIPE_VERSION_KEY.format(pk)
+
+
+def invalidate_recipe(pk):
+    """Сбрасывает закэшированные ответы с рецептом и списки рецептов."""
+    bump_version(recipe_version_key(pk))
+    bump_version(RECIPE_LIST_VERSION_KEY)
+
+
+def invalidate_recipe_list():
+    bump_version(RECIPE_LIST_VERSION_KEY)
+
+
+def invalidate_recipe_authors():
+    bump_version(RECIPE_AUTHORS_VERSION_KEY)
@@ -0,0 +1,76 @@
+from django.apps import apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Денормализованные счетчики: (модель, поле-счетчик, считаемая модель,
+# поле связи считаемой модели с моделью счетчика).
+COUNTERS = [
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorite', 'recipe'),
+    ('recipes.Recipe', 'in_carts_count', 'recipes.ShoppingCart', 'recipe'),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('users.CustomUser', 'subscribers_count', 'users.Subscription', 'author'),
+]
+
+
+class CounterFieldsMixin:
+    """
+    Обычное сохранение модели не записывает счетчики из COUNTERS: они
+    меняются только выражениями F(), и значение, загруженное вместе
+    с объектом, могло устареть. Записать счетчик можно, явно указав его
+    в update_fields.
+    """
+
+    def save(self, *args, **kwargs):
+        if not (
+            args or self._state.adding or kwargs.get('force_insert')
+            or kwargs.get('update_fields') is not None
+        ):
+            kwargs['update_fields'] = self.fields_without_counters()
+        super().save(*args, **kwargs)
+
+    def fields_without_counters(self):
+        """Загруженные поля модели, кроме первичного ключа и счетчиков."""
+        counters = {
+            counter for model_name, counter, _, _ in COUNTERS
+            if model_name == self._meta.label
+        }
+        deferred = self.get_deferred_fields()
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.name not in counters
+            and field.attname not in deferred
+        ]
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счетчик выражением F() без чтения строки."""
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def recount_counters(get_model=apps.get_model):
+    """
+    Пересчитывает все счетчики пакетными UPDATE, исправляя только
+    разошедшиеся строки. Возвращает число исправленных строк по счетчикам.
+    """
+    fixed = {}
+    for model_name, counter, counted_name, field in COUNTERS:
+        model = get_model(model_name)
+        actual = count_subquery(get_model(counted_name), field)
+        fixed[f'{model_name}.{counter}'] = model.objects.exclude(
+            **{counter: actual}
+        ).update(**{counter: actual})
+    return fixed
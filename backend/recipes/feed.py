@@ -0,0 +1,61 @@
+from itertools import islice
+
+from django.conf import settings
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+BATCH_SIZE = 1000
+
+
+def timeline_enabled():
+    return settings.RECIPE_FEED_STRATEGY == 'timeline'
+
+
+def insert_entries(rows):
+    """Вставляет записи (user_id, recipe_id, pub_date) пачками."""
+    rows = iter(rows)
+    while True:
+        batch = [
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for user_id, recipe_id, pub_date in islice(rows, BATCH_SIZE)
+        ]
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты всех подписчиков автора."""
+    followers = Subscription.objects.filter(
+        author=recipe.author_id
+    ).values_list('user', flat=True)
+    insert_entries(
+        (user_id, recipe.pk, recipe.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def follow(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные рецепты автора."""
+    recipes = Recipe.objects.filter(author=author_id).values_list(
+        'id', 'pub_date'
+    )
+    insert_entries(
+        (user_id, recipe_id, pub_date)
+        for recipe_id, pub_date in recipes.iterator()
+    )
+
+
+def unfollow(user_id, author_id):
+    FeedEntry.objects.filter(user=user_id, recipe__author=author_id).delete()
+
+
+def rebuild_feed():
+    """Заново заполняет ленты всех пользователей по подпискам."""
+    FeedEntry.objects.all().delete()
+    rows = Recipe.objects.filter(
+        author__subscribing__isnull=False
+    ).values_list('author__subscribing__user', 'id', 'pub_date')
+    insert_entries(rows.order_by().iterator())
+    return FeedEntry.objects.count()
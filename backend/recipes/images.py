@@ -0,0 +1,121 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Наибольшая сторона изображения в пикселях для каждой копии.
+RENDITIONS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1200,
+}
+RENDITIONS_DIR = 'recipes/images/renditions'
+
+
+def rendition_names(name):
+    """
+    Имена копий изображения: в исходном формате (JPEG или PNG) и в WebP.
+    Имена выводятся из имени оригинала, поэтому известны без обращения
+    к хранилищу.
+    """
+    stem, ext = os.path.splitext(os.path.basename(name))
+    ext = 'jpg' if ext.lower() in ('.jpg', '.jpeg') else 'png'
+    names = {}
+    for rendition in RENDITIONS:
+        base = os.path.join(RENDITIONS_DIR, f'{stem}_{rendition}')
+        names[rendition] = f'{base}.{ext}'
+        names[f'{rendition}_webp'] = f'{base}.webp'
+    return names
+
+
+def renditions_storage(storage):
+    """
+    Копии хранятся под именами, выведенными из имени оригинала, поэтому
+    в хранилище с адресацией по содержимому пишутся под точными именами.
+    """
+    return getattr(storage, 'exact', storage)
+
+
+def renditions_ready(name, storage=default_storage):
+    """Копии записываются по порядку, поэтому достаточно проверить
+    последнюю."""
+    last = list(rendition_names(name).values())[-1]
+    return renditions_storage(storage).exists(last)
+
+
+def encode(image, path):
+    buffer = BytesIO()
+    if path.endswith('.webp'):
+        image.save(buffer, 'WEBP', quality=80, method=4)
+    elif path.endswith('.jpg'):
+        image.convert('RGB').save(
+            buffer, 'JPEG', quality=85, optimize=True, progressive=True
+        )
+    else:
+        image.save(buffer, 'PNG', optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_renditions(name, storage=default_storage):
+    """Создает недостающие уменьшенные копии изображения."""
+    names = rendition_names(name)
+    target = renditions_storage(storage)
+    if all(target.exists(path) for path in names.values()):
+        return
+    with storage.open(name) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    for rendition, size in RENDITIONS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        for key in (rendition, f'{rendition}_webp'):
+            path = names[key]
+            if not target.exists(path):
+                target.save(path, encode(image, path))
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PIPELINE['WORKERS'],
+                thread_name_prefix='image-renditions',
+            )
+    return _executor
+
+
+def process_image(name, storage, callback=None):
+    # В потоке пула необработанное исключение осталось бы в Future
+    # незамеченным, поэтому любая ошибка PIL или хранилища логируется.
+    try:
+        generate_renditions(name, storage)
+    except Exception:
+        logger.exception('Не удалось создать копии %s', name)
+        return
+    if callback is not None:
+        callback()
+
+
+def schedule_renditions(name, storage=default_storage, callback=None):
+    """
+    Ставит обработку изображения в очередь пула потоков или, при
+    IMAGE_PIPELINE['EXECUTOR'] == 'sync' (тесты), выполняет сразу.
+    callback вызывается после создания копий.
+    """
+    if settings.IMAGE_PIPELINE['EXECUTOR'] == 'sync':
+        process_image(name, storage, callback)
+    else:
+        get_executor().submit(process_image, name, storage, callback)
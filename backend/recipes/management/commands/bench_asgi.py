@@ -0,0 +1,230 @@
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.management.stats import latency_summary
+from recipes.models import Ingredient, Recipe
+
+HOST = '127.0.0.1'
+REQUEST = (
+    'GET {path} HTTP/1.1\r\n'
+    'Host: localhost\r\n'
+    'Connection: keep-alive\r\n'
+    '\r\n'
+)
+NETWORK_ERRORS = (
+    OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError,
+)
+
+
+async def read_response(reader):
+    """Читает ответ HTTP/1.1 целиком, возвращает статус и заголовки."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        headers['connection'] = 'close'
+    return status, headers
+
+
+class Connection:
+    """Одно клиентское соединение, выполняющее запросы друг за другом."""
+
+    def __init__(self, port, timeout, result):
+        self.port = port
+        self.timeout = timeout
+        self.result = result
+        self.reader = self.writer = None
+
+    async def request(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                HOST, self.port
+            )
+        self.writer.write(REQUEST.format(path=path).encode())
+        await self.writer.drain()
+        return await read_response(self.reader)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def run(self, paths, deadline, rng):
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status, headers = await asyncio.wait_for(
+                    self.request(rng.choice(paths)), self.timeout
+                )
+            except NETWORK_ERRORS:
+                self.result['errors'] += 1
+                self.close()
+                await asyncio.sleep(0.1)
+                continue
+            self.result['latencies'].append(time.perf_counter() - start)
+            if status != 200:
+                self.result['errors'] += 1
+            if headers.get('connection') == 'close':
+                self.close()
+        self.close()
+
+
+async def drive(port, paths, options):
+    result = {'latencies': [], 'errors': 0}
+    rng = random.Random(options['seed'])
+    deadline = time.monotonic() + options['duration']
+    connections = [
+        Connection(port, options['timeout'], result)
+        for _ in range(options['connections'])
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        connection.run(paths, deadline, random.Random(rng.random()))
+        for connection in connections
+    ))
+    return result, time.perf_counter() - start
+
+
+async def wait_ready(port, timeout):
+    deadline = time.monotonic() + timeout
+    result = {'latencies': [], 'errors': 0}
+    while time.monotonic() < deadline:
+        connection = Connection(port, 5, result)
+        try:
+            status, _ = await connection.request('/api/tags/')
+        except NETWORK_ERRORS:
+            await asyncio.sleep(0.3)
+            continue
+        finally:
+            connection.close()
+        if status == 200:
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        'Start gunicorn with sync (WSGI) and uvicorn (ASGI) workers in turn '
+        'and compare throughput of read endpoints under many concurrent '
+        'connections'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'],
+                            choices=['wsgi', 'asgi'])
+        parser.add_argument('--connections', default=500, type=int)
+        parser.add_argument('--duration', default=20, type=float,
+                            help='Load duration per mode in seconds')
+        parser.add_argument('--workers', default=1, type=int,
+                            help='Gunicorn workers')
+        parser.add_argument('--threads', default=8, type=int,
+                            help='Read thread pool size in ASGI mode')
+        parser.add_argument('--timeout', default=30, type=float,
+                            help='Request timeout in seconds')
+        parser.add_argument('--port', default=8301, type=int)
+        parser.add_argument('--output', help='Path of the JSON report')
+        parser.add_argument('--seed', default=0, type=int)
+
+    def get_paths(self, rng):
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True)[:500])
+        names = list(Ingredient.objects.values_list('name', flat=True)[:500])
+        if not (recipe_ids and names):
+            raise CommandError('Сначала заполните базу: seed_load')
+        paths = ['/api/tags/']
+        paths += [f'/api/recipes/?page={page}' for page in range(1, 6)]
+        paths += [
+            f'/api/recipes/{recipe_id}/'
+            for recipe_id in rng.sample(recipe_ids, min(20, len(recipe_ids)))
+        ]
+        paths += [
+            f'/api/ingredients/?name={quote(name[:2])}'
+            for name in rng.sample(names, min(20, len(names)))
+        ]
+        return paths
+
+    def start_server(self, mode, options):
+        env = dict(
+            os.environ,
+            SERVER_MODE=mode,
+            GUNICORN_BIND=f'{HOST}:{options["port"]}',
+            GUNICORN_WORKERS=str(options['workers']),
+            ASYNC_READ_THREADS=str(options['threads']),
+        )
+        output = None if options['verbosity'] > 1 else subprocess.DEVNULL
+        return subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn',
+                f'foodgram.{mode}:application', '-c', 'gunicorn.conf.py',
+            ],
+            cwd=settings.BASE_DIR, env=env, stdout=output, stderr=output,
+        )
+
+    def bench_mode(self, mode, paths, options):
+        server = self.start_server(mode, options)
+        try:
+            if not asyncio.run(wait_ready(options['port'], 30)):
+                raise CommandError(f'Сервер в режиме {mode} не запустился')
+            result, elapsed = asyncio.run(
+                drive(options['port'], paths, options)
+            )
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(30)
+        if not result['latencies']:
+            raise CommandError(f'{mode}: не выполнено ни одного запроса')
+        return {
+            'requests': len(result['latencies']),
+            'errors': result['errors'],
+            'rps': round(len(result['latencies']) / elapsed, 2),
+            **latency_summary(result['latencies']),
+        }
+
+    def handle(self, *args, **options):
+        paths = self.get_paths(random.Random(options['seed']))
+        report = {
+            'connections': options['connections'],
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'modes': {},
+        }
+        for mode in options['modes']:
+            summary = self.bench_mode(mode, paths, options)
+            report['modes'][mode] = summary
+            self.stdout.write(
+                f'{mode}: connections={options["connections"]} '
+                f'requests={summary["requests"]} '
+                f'errors={summary["errors"]} rps={summary["rps"]} '
+                f'p50={summary["p50"]}ms p95={summary["p95"]}ms '
+                f'p99={summary["p99"]}ms'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
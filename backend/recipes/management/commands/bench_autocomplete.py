@@ -0,0 +1,75 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from recipes.management.stats import latency_summary
+from recipes.models import Ingredient
+
+AUTOCOMPLETE_URL = '/api/ingredients/?name={}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure /api/ingredients/ autocomplete latency while several '
+        'users type ingredient names concurrently'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=20, type=int,
+                            help='Number of concurrently typing users')
+        parser.add_argument('--words', default=10, type=int,
+                            help='Ingredient names typed by each user')
+        parser.add_argument('--max-prefix', default=8, type=int,
+                            help='Maximum number of typed characters')
+        parser.add_argument('--seed', default=0, type=int)
+
+    def type_words(self, words, max_prefix):
+        client = Client()
+        latencies = []
+        try:
+            for word in words:
+                for length in range(1, min(len(word), max_prefix) + 1):
+                    url = AUTOCOMPLETE_URL.format(quote(word[:length]))
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f'{url} вернул {response.status_code}'
+                        )
+        finally:
+            connection.close()
+        return latencies
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError('Сначала загрузите ингредиенты: import_ings')
+        rng = random.Random(options['seed'])
+        workload = [
+            rng.choices(names, k=options['words'])
+            for _ in range(options['users'])
+        ]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['users']) as executor:
+            results = executor.map(
+                lambda words: self.type_words(words, options['max_prefix']),
+                workload,
+            )
+            latencies = [value for result in results for value in result]
+        elapsed = time.perf_counter() - start
+
+        summary = latency_summary(latencies)
+        self.stdout.write(
+            f'requests={len(latencies)} users={options["users"]} '
+            f'rps={len(latencies) / elapsed:.1f} '
+            f'p50={summary["p50"]:.1f}ms '
+            f'p95={summary["p95"]:.1f}ms '
+            f'p99={summary["p99"]:.1f}ms'
+        )
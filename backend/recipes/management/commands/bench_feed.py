@@ -0,0 +1,138 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import CustomPagination
+from recipes.feed import fan_out_recipe, insert_entries
+from recipes.management.stats import latency_summary
+from recipes.models import FeedEntry, Recipe
+from users.models import CustomUser, Subscription
+
+BENCH_PREFIX = 'bench-feed'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare join and timeline strategies of /api/recipes/feed/ '
+        'for a user following many authors; changes are rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--follows', default=10000, type=int,
+                            help='Number of authors followed by the reader')
+        parser.add_argument('--recipes-per-author', default=2, type=int)
+        parser.add_argument('--pages', default=20, type=int,
+                            help='Pages read with keyset pagination')
+        parser.add_argument('--limit', default=6, type=int)
+        parser.add_argument('--repeat', default=5, type=int)
+
+    def create_data(self, follows, recipes_per_author):
+        """
+        Читатель подписан на follows авторов, а все авторы подписаны
+        на читателя, чтобы измерить и рассылку его нового рецепта.
+        """
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{BENCH_PREFIX}-{index}',
+                email=f'{BENCH_PREFIX}-{index}@example.com',
+                password='!',
+            )
+            for index in range(follows + 1)
+        ])
+        users = list(CustomUser.objects.filter(
+            username__startswith=BENCH_PREFIX
+        ).order_by('id'))
+        reader, authors = users[0], users[1:]
+        Subscription.objects.bulk_create(
+            [Subscription(user=reader, author=author) for author in authors]
+            + [Subscription(user=author, author=reader) for author in authors],
+            batch_size=1000,
+        )
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    name=f'{BENCH_PREFIX}-{author.pk}-{index}',
+                    text='text',
+                    cooking_time=1,
+                    image='recipes/images/bench.png',
+                    author=author,
+                )
+                for author in authors
+                for index in range(recipes_per_author)
+            ],
+            batch_size=1000,
+        )
+        recipes = list(Recipe.objects.filter(author__in=authors))
+        now = timezone.now()
+        for index, recipe in enumerate(recipes):
+            recipe.pub_date = now - timedelta(minutes=index)
+        Recipe.objects.bulk_update(recipes, ['pub_date'], batch_size=1000)
+        insert_entries(
+            (reader.pk, recipe.pk, recipe.pub_date) for recipe in recipes
+        )
+        return reader
+
+    def read_pages(self, reader, strategy, pages, limit):
+        factory = APIRequestFactory()
+        paginator = CustomPagination()
+        cursor = ''
+        timings = []
+        for _ in range(pages):
+            request = Request(factory.get(
+                '/api/recipes/feed/', {'cursor': cursor, 'limit': limit}
+            ))
+            start = time.perf_counter()
+            paginator.paginate_queryset(
+                Recipe.objects.feed(reader, strategy), request
+            )
+            timings.append(time.perf_counter() - start)
+            if paginator.next_position is None:
+                break
+            cursor = paginator.encode_cursor(paginator.next_position)
+        return timings
+
+    def report(self, name, timings):
+        summary = latency_summary(timings)
+        self.stdout.write(
+            f'{name}: p50={summary["p50"]:.2f}ms '
+            f'p95={summary["p95"]:.2f}ms max={summary["max"]:.2f}ms'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            start = time.perf_counter()
+            reader = self.create_data(
+                options['follows'], options['recipes_per_author']
+            )
+            self.stdout.write(
+                f'Данные созданы за {time.perf_counter() - start:.1f} с '
+                f'({connection.vendor})'
+            )
+            for strategy in ('join', 'timeline'):
+                first, deep = [], []
+                for _ in range(options['repeat']):
+                    timings = self.read_pages(
+                        reader, strategy, options['pages'], options['limit']
+                    )
+                    first.append(timings[0])
+                    deep.extend(timings[1:])
+                self.report(f'{strategy} первая страница', first)
+                self.report(f'{strategy} следующие страницы', deep)
+
+            recipe = Recipe.objects.create(
+                name=f'{BENCH_PREFIX}-reader', text='text', cooking_time=1,
+                image='recipes/images/bench.png', author=reader,
+            )
+            FeedEntry.objects.filter(recipe=recipe).delete()
+            start = time.perf_counter()
+            fan_out_recipe(recipe)
+            self.stdout.write(
+                f'timeline: рассылка рецепта {options["follows"]} '
+                f'подписчикам {(time.perf_counter() - start) * 1000:.1f}ms'
+            )
+            transaction.set_rollback(True)
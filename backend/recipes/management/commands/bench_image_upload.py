@@ -0,0 +1,75 @@
+import base64
+import io
+import math
+import os
+import resource
+import time
+import tracemalloc
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import Base64ImageField
+
+SIZES_MB = [1, 5, 20]
+
+
+def make_payload(size):
+    """PNG из случайного шума (не сжимается) размером около size байт."""
+    side = int(math.sqrt(size // 3))
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=0)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return 'data:image/png;base64,' + encoded
+
+
+def decode_in_memory(field, data):
+    """Прежний способ: split, полная копия в bytes и ContentFile."""
+    format, imgstr = data.split(';base64,')
+    content = ContentFile(base64.b64decode(imgstr), name='temp.png')
+    return serializers.ImageField.to_internal_value(field, content)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure peak memory allocated while decoding base64 image '
+        'uploads of 1, 5 and 20 MB'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=SIZES_MB,
+                            help='Decoded upload sizes in MB')
+
+    def measure(self, decode, field, data):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            decode(field, data).close()
+            result = 'ok'
+        except serializers.ValidationError as error:
+            result = error.detail[0].code
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, peak, elapsed
+
+    def handle(self, *args, **options):
+        for size_mb in options['sizes']:
+            size = size_mb * 1024 * 1024
+            data = make_payload(size)
+            field = Base64ImageField(max_size=2 * size)
+            for mode, decode in (
+                ('streaming', Base64ImageField.to_internal_value),
+                ('in-memory', decode_in_memory),
+            ):
+                result, peak, elapsed = self.measure(decode, field, data)
+                self.stdout.write(
+                    f'size={size_mb}MB mode={mode} result={result} '
+                    f'peak={peak / 1024 / 1024:.1f}MB '
+                    f'time={elapsed * 1000:.0f}ms'
+                )
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(f'process maxrss={maxrss / 1024:.1f}MB')
@@ -0,0 +1,90 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from users import authentication
+from users.authentication import CachedTokenAuthentication
+from users.models import CustomUser
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request cost of TokenAuthentication and '
+        'CachedTokenAuthentication: time and database queries'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', default=2000, type=int)
+
+    def measure(self, backend, request, count, before=None):
+        """Среднее время и число запросов к базе на одну аутентификацию."""
+        elapsed = 0.0
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(count):
+                if before is not None:
+                    before()
+                start = time.perf_counter()
+                backend.authenticate(request)
+                elapsed += time.perf_counter() - start
+        return elapsed / count * 1_000_000, len(queries) / count
+
+    def run(self, count):
+        user = CustomUser.objects.filter(is_active=True).first()
+        if user is None:
+            raise CommandError('Нет пользователей: выполните seed_load')
+        Token.objects.filter(user=user).delete()
+        token = Token.objects.create(user=user)
+        request = APIRequestFactory().get(
+            '/api/users/me/', HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        cached = CachedTokenAuthentication()
+        results = [
+            ('TokenAuthentication', self.measure(
+                TokenAuthentication(), request, count
+            )),
+            ('cached, process LRU hit', self.measure(
+                cached, request, count
+            )),
+            ('cached, shared cache hit', self.measure(
+                cached, request, count, authentication._tokens.clear
+            )),
+        ]
+        # После выхода пользователя токен больше не принимается.
+        Token.objects.filter(user=user).delete()
+        rejected = False
+        try:
+            cached.authenticate(request)
+        except AuthenticationFailed:
+            rejected = True
+        return results, rejected
+
+    def handle(self, *args, **options):
+        # Кэш сравнивается и там, где он выключен по умолчанию.
+        config = dict(settings.TOKEN_AUTH_CACHE, ENABLED=True)
+        try:
+            with transaction.atomic(), override_settings(
+                TOKEN_AUTH_CACHE=config
+            ):
+                results, rejected = self.run(options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+        for name, (microseconds, queries) in results:
+            self.stdout.write(
+                f'{name}: {microseconds:.1f} мкс, '
+                f'{queries:.2f} SQL-запросов на запрос'
+            )
+        self.stdout.write(
+            f'Токен после выхода отклонен: {"да" if rejected else "нет"}'
+        )
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodgram.db import metrics
+
+
+class Command(BaseCommand):
+    help = (
+        'Show database connection metrics collected by all workers: '
+        'connection open rate and checkout latency per database alias'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Reset the counters')
+
+    def checkout_percentile(self, stats, percent):
+        """Верхняя граница корзины гистограммы, в которую попал перцентиль."""
+        target = stats['checkouts'] * percent / 100
+        seen = 0
+        for bound in metrics.CHECKOUT_BUCKETS:
+            seen += stats[metrics.bucket_name(bound)]
+            if seen >= target:
+                return f'<={bound}ms' if bound else '>500ms'
+        return '-'
+
+    def handle(self, *args, **options):
+        aliases = list(settings.DATABASES)
+        if options['reset']:
+            metrics.reset(aliases)
+            self.stdout.write('Счетчики сброшены')
+            return
+        started = metrics.get_started()
+        elapsed = time.time() - started if started else 0
+        self.stdout.write(
+            f'CONN_MAX_AGE={settings.DATABASES["default"]["CONN_MAX_AGE"]} '
+            f'SERVER_MODE={settings.SERVER_MODE} '
+            f'PgBouncer={settings.DB_PGBOUNCER} '
+            f'период {elapsed:.0f} с'
+        )
+        for alias in aliases:
+            stats = metrics.get_stats(alias)
+            opens = stats['opens']
+            checkouts = stats['checkouts']
+            open_rate = opens / elapsed if elapsed else 0
+            open_avg = stats['open_us'] / opens / 1000 if opens else 0
+            checkout_avg = (
+                stats['checkout_us'] / checkouts / 1000 if checkouts else 0
+            )
+            reused = (1 - opens / checkouts) * 100 if checkouts else 0
+            self.stdout.write(
+                f'{alias}: opens={opens} open_rate={open_rate:.2f}/s '
+                f'open_avg={open_avg:.2f}ms checkouts={checkouts} '
+                f'checkout_avg={checkout_avg:.2f}ms '
+                f'checkout_p95{self.checkout_percentile(stats, 95)} '
+                f'reused={max(reused, 0):.1f}%'
+            )
@@ -0,0 +1,141 @@
+import re
+
+from django.core.exceptions import EmptyResultSet
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from api.filters import IngredientFilter, with_popularity
+from recipes.models import Recipe, RecipeIngredient, Tag
+from recipes.search import search_recipes
+from users.models import CustomUser, Subscription
+
+PAGE_SIZE = 6
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    # В SQLite полный просмотр - SCAN без USING INDEX.
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)'),
+}
+
+
+def hot_queries(user):
+    """Основные запросы эндпоинтов с параметрами типичного запроса."""
+    recipes = Recipe.objects.with_user_flags(user)
+    recipe_ids = list(recipes.values_list('id', flat=True)[:PAGE_SIZE])
+    tag_ids = list(Tag.objects.values_list('id', flat=True)[:1])
+    author_ids = list(Subscription.objects.filter(user=user).values_list(
+        'author', flat=True
+    )[:PAGE_SIZE])
+    return {
+        'recipes list': recipes[:PAGE_SIZE],
+        'recipes list ?tags': recipes.filter(
+            tags__in=tag_ids
+        ).distinct()[:PAGE_SIZE],
+        'recipes list ?author': recipes.filter(author=user)[:PAGE_SIZE],
+        'recipes list ?is_favorited': recipes.filter(
+            is_favorited__user=user
+        )[:PAGE_SIZE],
+        'recipes list ?is_in_shopping_cart': recipes.filter(
+            is_in_shopping_cart__user=user
+        )[:PAGE_SIZE],
+        'recipes list ?search': search_recipes(recipes, 'суп')[:PAGE_SIZE],
+        'recipes tags prefetch': Recipe.tags.through.objects.filter(
+            recipe__in=recipe_ids
+        ).select_related('tag'),
+        'recipes ingredients prefetch': RecipeIngredient.objects.filter(
+            recipe__in=recipe_ids
+        ).select_related('ingredient'),
+        'recipes retrieve': recipes.filter(pk__in=recipe_ids[:1]),
+        'recipes popular': with_popularity(recipes).order_by(
+            '-popularity', '-id'
+        )[:PAGE_SIZE],
+        'recipes feed (join)': Recipe.objects.feed(user, 'join')[:PAGE_SIZE],
+        'recipes feed (timeline)': Recipe.objects.feed(
+            user, 'timeline'
+        )[:PAGE_SIZE],
+        'recipes download_shopping_cart':
+            RecipeIngredient.objects.shopping_list(user),
+        'ingredients list ?name': IngredientFilter().filter_name(
+            IngredientFilter.Meta.model.objects.all(), 'name', 'сах'
+        ),
+        'users list': CustomUser.objects.order_by('-date_joined')[:PAGE_SIZE],
+        'users subscriptions': Subscription.objects.filter(
+            user=user
+        ).select_related('author')[:PAGE_SIZE],
+        'users subscriptions recipes': Recipe.objects.latest_per_author(
+            author_ids, 3
+        ),
+    }
+
+
+def is_empty(queryset):
+    """Запрос с заведомо пустым результатом (например, id__in=[])."""
+    try:
+        queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return True
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN (ANALYZE, BUFFERS) for the querysets behind the main '
+        'API endpoints and flag sequential scans'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str,
+                            help='Username whose lists are explained '
+                                 '(default: the user with most favorites)')
+        parser.add_argument('--ignore', nargs='*', default=['recipes_tag'],
+                            help='Tables whose sequential scans are expected')
+        parser.add_argument('--plans', action='store_true',
+                            help='Print full query plans')
+        parser.add_argument('--fail-on-seq-scan', action='store_true',
+                            help='Exit with an error if a scan is flagged')
+
+    def get_user(self, username):
+        users = CustomUser.objects.all()
+        if username:
+            users = users.filter(username=username)
+        user = users.annotate(
+            favorites_total=Count('favorites')
+        ).order_by('-favorites_total', 'id').first()
+        if user is None:
+            raise CommandError('Нет пользователей: заполните базу данными')
+        return user
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'СУБД {connection.vendor} не поддерживается')
+        # Подзапросы в плане тоже просматриваются целиком, учитываются
+        # только таблицы.
+        tables = set(connection.introspection.table_names())
+        tables -= set(options['ignore'])
+        flagged = 0
+        for name, queryset in hot_queries(user).items():
+            if is_empty(queryset):
+                self.stdout.write(f'{name}: пустой запрос, план не строится')
+                continue
+            plan = self.explain(queryset)
+            scans = sorted(set(pattern.findall(plan)) & tables)
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: SEQ SCAN {", ".join(scans)}'
+                ))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if options['plans'] or scans:
+                self.stdout.write(plan + '\n')
+        summary = f'Запросов с последовательным сканированием: {flagged}'
+        if flagged and options['fail_on_seq_scan']:
+            raise CommandError(summary)
+        self.stdout.write(summary)
@@ -1,43 +1,161 @@
 import csv
+import io
+import json
 import logging
 import os
+import time
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes.catalog import invalidate_ingredient_catalog
 from recipes.models import Ingredient
 
-logging.basicConfig(
-    level=logging.INFO,
-    filename='main.log',
-    format='%(asctime)s, %(levelname)s, %(name)s, %(message)s',
-    filemode='w',
-)
+logger = logging.getLogger('foodgram.import_ings')
 
 DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+BATCH_SIZE = 1000
+MAX_LENGTH = Ingredient._meta.get_field('name').max_length
 
 
 class Command(BaseCommand):
-    help = 'Load data from csv file into the database'
+    help = 'Load ingredients from csv or json file into the database'
 
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.csv', nargs='?',
                             type=str)
+        parser.add_argument('--batch-size', default=BATCH_SIZE, type=int,
+                            help='Number of rows per INSERT statement')
+        parser.add_argument('--copy', action='store_true',
+                            help='Use COPY FROM STDIN (PostgreSQL only)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Parse the file without writing to database')
+
+    def read_rows(self, filename):
+        path = os.path.join(DATA_ROOT, filename)
+        with open(path, newline='', encoding='utf8') as file:
+            if filename.endswith('.json'):
+                return self.read_json(filename, file)
+            return self.read_csv(filename, file)
+
+    def read_csv(self, filename, file):
+        reader = csv.reader(file)
+        return [
+            self.validate_row(f'{filename}:{reader.line_num}', row)
+            for row in reader if row
+        ]
+
+    def read_json(self, filename, file):
+        try:
+            items = json.load(file)
+        except ValueError as error:
+            raise CommandError(f'{filename}: некорректный JSON: {error}')
+        if not isinstance(items, list):
+            raise CommandError(f'{filename}: ожидается список ингредиентов')
+        rows = []
+        for number, item in enumerate(items, start=1):
+            place = f'{filename}: элемент {number}'
+            if not isinstance(item, dict) or not {
+                'name', 'measurement_unit',
+            } <= set(item):
+                raise CommandError(
+                    f'{place}: ожидаются поля name и measurement_unit'
+                )
+            rows.append(self.validate_row(
+                place, (item['name'], item['measurement_unit'])
+            ))
+        return rows
+
+    def validate_row(self, place, row):
+        """Строка файла: непустые название и единица измерения."""
+        if len(row) != 2:
+            raise CommandError(
+                f'{place}: ожидается 2 столбца (название, единица '
+                f'измерения), получено {len(row)}'
+            )
+        for value in row:
+            if not isinstance(value, str) or not value.strip():
+                raise CommandError(
+                    f'{place}: пустое название или единица измерения'
+                )
+            if len(value) > MAX_LENGTH:
+                raise CommandError(
+                    f'{place}: значение длиннее {MAX_LENGTH} символов'
+                )
+        return tuple(row)
+
+    def get_new_rows(self, rows):
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        new_rows = []
+        for row in rows:
+            if row not in existing:
+                existing.add(row)
+                new_rows.append(row)
+        return new_rows
+
+    def bulk_insert(self, rows, batch_size):
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in rows
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+    def copy_insert(self, rows):
+        """Загружает строки через COPY во временную таблицу и переносит
+        их в таблицу ингредиентов одним INSERT ... SELECT."""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_staging '
+                '(name varchar(150), measurement_unit varchar(150)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_staging (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT name, measurement_unit FROM ingredient_staging '
+                'ON CONFLICT DO NOTHING'
+            )
 
     def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('COPY доступен только для PostgreSQL')
+        start = time.perf_counter()
         try:
-            with open(
-                os.path.join(DATA_ROOT, options['filename']),
-                newline='',
-                encoding='utf8'
-            ) as csv_file:
-                data = csv.reader(csv_file)
-                for row in data:
-                    name, measurement_unit = row
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
+            rows = self.read_rows(options['filename'])
         except FileNotFoundError:
             raise CommandError('Добавьте файл ingredients в директорию data')
-        logging.info('Successfully loaded all data into database')
+        except UnicodeDecodeError as error:
+            raise CommandError(f'Файл ингредиентов не в UTF-8: {error}')
+
+        with transaction.atomic():
+            new_rows = self.get_new_rows(rows)
+            if not options['dry_run'] and new_rows:
+                if options['copy']:
+                    self.copy_insert(new_rows)
+                else:
+                    self.bulk_insert(new_rows, options['batch_size'])
+                invalidate_ingredient_catalog()
+
+        elapsed = time.perf_counter() - start
+        message = (
+            f'Прочитано {len(rows)} строк, новых {len(new_rows)}, '
+            f'{elapsed:.3f} с, {len(rows) / max(elapsed, 1e-6):.0f} строк/с'
+        )
+        if options['dry_run']:
+            message += ' (dry run, база не изменена)'
+        self.stdout.write(self.style.SUCCESS(message))
+        logger.info(message)
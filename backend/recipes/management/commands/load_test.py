@@ -0,0 +1,294 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from recipes.management.stats import latency_summary
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+
+
+class Workload:
+    """Идентификаторы из базы, из которых собираются запросы."""
+
+    def __init__(self, prefix):
+        self.recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        self.author_ids = list(Recipe.objects.order_by().values_list(
+            'author', flat=True
+        ).distinct())
+        self.tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredient_names = list(Ingredient.objects.values_list(
+            'name', flat=True
+        ))
+        self.emails = list(CustomUser.objects.filter(
+            username__startswith=prefix
+        ).order_by('id').values_list('email', flat=True))
+        if not (self.recipe_ids and self.tag_slugs and self.emails):
+            raise CommandError('Сначала заполните базу: seed_load')
+
+
+class VirtualUser:
+    """Пользователь, выполняющий случайные сценарии с весами."""
+
+    def __init__(self, base_url, workload, email, password, rng, record):
+        self.base_url = base_url.rstrip('/')
+        self.workload = workload
+        self.rng = rng
+        self.record = record
+        self.session = requests.Session()
+        self.authenticated = email is not None
+        if self.authenticated:
+            try:
+                response = self.session.post(
+                    f'{self.base_url}/api/auth/token/login/',
+                    json={'email': email, 'password': password},
+                )
+            except requests.RequestException as error:
+                raise CommandError(f'Сервер недоступен: {error}')
+            if response.status_code != 200:
+                raise CommandError(f'Не удалось войти как {email}')
+            self.session.headers['Authorization'] = (
+                f'Token {response.json()["auth_token"]}'
+            )
+
+    def request(self, name, method, path, expected=(200, ), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, f'{self.base_url}{path}', **kwargs
+            )
+        except requests.RequestException:
+            self.record(name, time.perf_counter() - start, True, None)
+            return None
+        elapsed = time.perf_counter() - start
+        match = QUERIES_PATTERN.search(response.headers.get(
+            'Server-Timing', ''
+        ))
+        self.record(
+            name, elapsed, response.status_code not in expected,
+            int(match.group(1)) if match else None,
+        )
+        return response
+
+    def scenarios(self):
+        scenarios = [
+            (30, self.recipe_list),
+            (10, self.recipe_list_tags),
+            (5, self.recipe_list_author),
+            (20, self.recipe_detail),
+            (15, self.ingredient_autocomplete),
+        ]
+        if self.authenticated:
+            scenarios += [
+                (5, self.recipe_list_favorited),
+                (5, self.favorite_toggle),
+                (3, self.download_shopping_cart),
+                (4, self.subscriptions),
+                (3, self.feed),
+            ]
+        return scenarios
+
+    def run(self, deadline):
+        scenarios = self.scenarios()
+        weights = [weight for weight, _ in scenarios]
+        while time.monotonic() < deadline:
+            self.rng.choices(scenarios, weights)[0][1]()
+
+    def recipe_list(self):
+        page = self.rng.randint(1, 20)
+        self.request('recipes list', 'GET', f'/api/recipes/?page={page}')
+
+    def recipe_list_tags(self):
+        slugs = self.rng.sample(
+            self.workload.tag_slugs,
+            self.rng.randint(1, len(self.workload.tag_slugs)),
+        )
+        query = '&'.join(f'tags={slug}' for slug in slugs)
+        self.request('recipes list ?tags', 'GET', f'/api/recipes/?{query}')
+
+    def recipe_list_author(self):
+        author = self.rng.choice(self.workload.author_ids)
+        self.request(
+            'recipes list ?author', 'GET', f'/api/recipes/?author={author}'
+        )
+
+    def recipe_list_favorited(self):
+        self.request(
+            'recipes list ?is_favorited', 'GET', '/api/recipes/?is_favorited=1'
+        )
+
+    def recipe_detail(self):
+        recipe = self.rng.choice(self.workload.recipe_ids)
+        self.request('recipes retrieve', 'GET', f'/api/recipes/{recipe}/')
+
+    def favorite_toggle(self):
+        """Добавляет рецепт в избранное и удаляет его, если он не был
+        там раньше, - данные остаются прежними."""
+        recipe = self.rng.choice(self.workload.recipe_ids)
+        path = f'/api/recipes/{recipe}/favorite/'
+        response = self.request(
+            'recipes favorite add', 'POST', path, expected=(201, 400)
+        )
+        if response is not None and response.status_code == 201:
+            self.request(
+                'recipes favorite remove', 'DELETE', path, expected=(204, )
+            )
+
+    def download_shopping_cart(self):
+        self.request(
+            'recipes download_shopping_cart', 'GET',
+            '/api/recipes/download_shopping_cart/',
+        )
+
+    def subscriptions(self):
+        self.request(
+            'users subscriptions', 'GET',
+            '/api/users/subscriptions/?recipes_limit=3',
+        )
+
+    def feed(self):
+        self.request('recipes feed', 'GET', '/api/recipes/feed/')
+
+    def ingredient_autocomplete(self):
+        name = self.rng.choice(self.workload.ingredient_names)
+        prefix = name[:self.rng.randint(1, min(len(name), 4))]
+        self.request(
+            'ingredients autocomplete', 'GET', '/api/ingredients/',
+            params={'name': prefix},
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a load test against a running server (runserver or gunicorn) '
+        'and save latency, throughput and query counts as a JSON baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', default=20, type=int)
+        parser.add_argument('--duration', default=30, type=float,
+                            help='Test duration in seconds')
+        parser.add_argument('--anonymous', default=0.5, type=float,
+                            help='Share of anonymous virtual users')
+        parser.add_argument('--prefix', default='load',
+                            help='Username prefix of seed_load users')
+        parser.add_argument('--password', default='load-password')
+        parser.add_argument('--output', help='Path of the JSON baseline')
+        parser.add_argument('--compare', help='Baseline to compare with')
+        parser.add_argument('--seed', default=0, type=int)
+
+    def run_load(self, options, workload):
+        results = defaultdict(lambda: {
+            'latencies': [], 'errors': 0, 'queries': [],
+        })
+        lock = threading.Lock()
+
+        def record(name, elapsed, error, queries):
+            with lock:
+                result = results[name]
+                result['latencies'].append(elapsed)
+                result['errors'] += error
+                if queries is not None:
+                    result['queries'].append(queries)
+
+        rng = random.Random(options['seed'])
+        users = []
+        for index in range(options['concurrency']):
+            email = None
+            if rng.random() >= options['anonymous']:
+                email = workload.emails[index % len(workload.emails)]
+            users.append(VirtualUser(
+                options['base_url'], workload, email, options['password'],
+                random.Random(rng.random()), record,
+            ))
+
+        start = time.perf_counter()
+        deadline = time.monotonic() + options['duration']
+        with ThreadPoolExecutor(max_workers=len(users)) as executor:
+            for future in [
+                executor.submit(user.run, deadline) for user in users
+            ]:
+                future.result()
+        return results, time.perf_counter() - start
+
+    def build_report(self, options, results, elapsed):
+        endpoints = {}
+        for name, result in sorted(results.items()):
+            queries = result['queries']
+            endpoints[name] = {
+                'requests': len(result['latencies']),
+                'errors': result['errors'],
+                'rps': round(len(result['latencies']) / elapsed, 2),
+                **latency_summary(result['latencies']),
+                'queries': (
+                    round(sum(queries) / len(queries), 2) if queries else None
+                ),
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'created': timezone.now().isoformat(),
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'duration': round(elapsed, 2),
+            'total': {
+                'requests': total,
+                'errors': sum(
+                    endpoint['errors'] for endpoint in endpoints.values()
+                ),
+                'rps': round(total / elapsed, 2),
+            },
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, report):
+        for name, endpoint in report['endpoints'].items():
+            self.stdout.write(
+                f'{name}: n={endpoint["requests"]} '
+                f'err={endpoint["errors"]} rps={endpoint["rps"]} '
+                f'p50={endpoint["p50"]}ms p95={endpoint["p95"]}ms '
+                f'p99={endpoint["p99"]}ms queries={endpoint["queries"]}'
+            )
+        total = report['total']
+        self.stdout.write(
+            f'Всего: {total["requests"]} запросов, ошибок {total["errors"]}, '
+            f'{total["rps"]} запросов/с'
+        )
+
+    def print_comparison(self, report, path):
+        with open(path, encoding='utf8') as file:
+            baseline = json.load(file)
+        self.stdout.write(f'Сравнение с {path} ({baseline["created"]}):')
+        for name, endpoint in report['endpoints'].items():
+            old = baseline['endpoints'].get(name)
+            if old is None:
+                continue
+            change = (endpoint['p95'] - old['p95']) / max(old['p95'], 1e-6)
+            self.stdout.write(
+                f'{name}: p95 {old["p95"]} -> {endpoint["p95"]}ms '
+                f'({change:+.0%}), rps {old["rps"]} -> {endpoint["rps"]}, '
+                f'queries {old["queries"]} -> {endpoint["queries"]}'
+            )
+
+    def handle(self, *args, **options):
+        workload = Workload(options['prefix'])
+        results, elapsed = self.run_load(options, workload)
+        if not results:
+            raise CommandError('Не выполнено ни одного запроса')
+        report = self.build_report(options, results, elapsed)
+        self.print_report(report)
+        if options['compare']:
+            self.print_comparison(report, options['compare'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
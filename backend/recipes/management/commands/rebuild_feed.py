@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feed
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild followers feeds (FeedEntry) from subscriptions; run after '
+        'switching RECIPE_FEED_STRATEGY to timeline'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_feed()
+        self.stdout.write(self.style.SUCCESS(f'Записей в лентах: {count}'))
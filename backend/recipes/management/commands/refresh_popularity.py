@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = 'Refresh the recipe popularity ranking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-concurrently', action='store_true',
+            help='Use a blocking REFRESH MATERIALIZED VIEW (PostgreSQL)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        refresh_popularity(concurrently=not options['no_concurrently'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинг обновлен за {time.perf_counter() - start:.3f} с'
+        ))
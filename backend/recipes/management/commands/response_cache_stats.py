@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import get_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit and miss counters of the anonymous recipe response cache'
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = sum(stats.values())
+        hits = stats['hit'] + stats['wait']
+        ratio = hits / total * 100 if total else 0
+        self.stdout.write(
+            f'hit={stats["hit"]} wait={stats["wait"]} '
+            f'miss={stats["miss"]} hit_ratio={ratio:.1f}%'
+        )
@@ -0,0 +1,203 @@
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.catalog import invalidate_recipe_list
+from recipes.counters import recount_counters
+from recipes.feed import rebuild_feed, timeline_enabled
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.popularity import refresh_popularity
+from users.models import CustomUser, Subscription
+
+BATCH_SIZE = 2000
+DEFAULT_TAGS = [
+    ('Завтрак', Tag.ORANGE, 'breakfast'),
+    ('Обед', Tag.GREEN, 'lunch'),
+    ('Ужин', Tag.PURPLE, 'dinner'),
+]
+
+
+def zipf_weights(count, exponent=1.1):
+    """Веса по закону Ципфа: немногие элементы встречаются часто."""
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def batched(rows):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset (users, recipes, favorites, carts, '
+        'subscriptions) with bulk inserts for load testing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=1000, type=int)
+        parser.add_argument('--recipes', default=10000, type=int)
+        parser.add_argument('--ingredients', default=(3, 15), nargs=2,
+                            type=int, metavar=('MIN', 'MAX'),
+                            help='Ingredients per recipe')
+        parser.add_argument('--favorites', default=30, type=int,
+                            help='Average favorites per user')
+        parser.add_argument('--carts', default=5, type=int,
+                            help='Average shopping cart recipes per user')
+        parser.add_argument('--follows', default=10, type=int,
+                            help='Average subscriptions per user')
+        parser.add_argument('--prefix', default='load',
+                            help='Prefix of generated usernames and names')
+        parser.add_argument('--password', default='load-password',
+                            help='Password of every generated user')
+        parser.add_argument('--seed', default=0, type=int)
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        password = make_password(options['password'])
+        for batch in batched(
+            CustomUser(
+                username=f'{prefix}{index}',
+                email=f'{prefix}{index}@example.com',
+                first_name='Нагрузка',
+                last_name=str(index),
+                password=password,
+            )
+            for index in range(options['users'])
+        ):
+            CustomUser.objects.bulk_create(batch)
+        return list(CustomUser.objects.filter(
+            username__startswith=prefix, email__endswith='@example.com'
+        ).order_by('id').values_list('id', flat=True))
+
+    def get_tags(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create([
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS
+            ])
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_recipes(self, options, user_ids, rng):
+        """Авторы и даты публикации распределены неравномерно: немногие
+        авторы публикуют большую часть рецептов."""
+        prefix = options['prefix']
+        authors = rng.choices(
+            user_ids, weights=zipf_weights(len(user_ids)),
+            k=options['recipes'],
+        )
+        for batch in batched(
+            Recipe(
+                name=f'{prefix} рецепт {index}',
+                text='Синтетический рецепт для нагрузочного теста.',
+                cooking_time=rng.randint(5, 180),
+                image='recipes/images/load.png',
+                author_id=author_id,
+            )
+            for index, author_id in enumerate(authors)
+        ):
+            Recipe.objects.bulk_create(batch)
+        recipes = list(Recipe.objects.filter(
+            name__startswith=f'{prefix} рецепт '
+        ).only('id', 'pub_date'))
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=rng.randint(0, 365 * 86400)
+            )
+        Recipe.objects.bulk_update(recipes, ['pub_date'], BATCH_SIZE)
+        return [recipe.pk for recipe in recipes]
+
+    def create_recipe_relations(self, options, recipe_ids, tag_ids, rng):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        weights = zipf_weights(len(ingredient_ids), exponent=0.8)
+        low, high = options['ingredients']
+
+        def recipe_ingredients():
+            for recipe_id in recipe_ids:
+                chosen = set(rng.choices(
+                    ingredient_ids, weights=weights, k=rng.randint(low, high)
+                ))
+                for ingredient_id in chosen:
+                    yield RecipeIngredient(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=rng.randint(1, 500),
+                    )
+
+        for batch in batched(recipe_ingredients()):
+            RecipeIngredient.objects.bulk_create(batch)
+
+        through = Recipe.tags.through
+        for batch in batched(
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, rng.randint(1, len(tag_ids)))
+        ):
+            through.objects.bulk_create(batch)
+
+    def create_user_lists(self, model, field, per_user, user_ids, targets,
+                          rng):
+        """Каждый пользователь выбирает в среднем per_user объектов,
+        популярные выбираются чаще."""
+        weights = zipf_weights(len(targets))
+
+        def rows():
+            for user_id in user_ids:
+                count = min(len(targets), int(rng.expovariate(1 / per_user)))
+                for target in set(rng.choices(targets, weights, k=count)):
+                    if target != user_id or field != 'author_id':
+                        yield model(user_id=user_id, **{field: target})
+
+        for batch in batched(rows()):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists():
+            raise CommandError('Сначала загрузите ингредиенты: import_ings')
+        if CustomUser.objects.filter(
+            username__startswith=options['prefix']
+        ).exists():
+            raise CommandError(
+                f'Данные с префиксом {options["prefix"]} уже есть, '
+                'укажите другой --prefix'
+            )
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+        with transaction.atomic():
+            user_ids = self.create_users(options)
+            tag_ids = self.get_tags()
+            recipe_ids = self.create_recipes(options, user_ids, rng)
+            self.create_recipe_relations(options, recipe_ids, tag_ids, rng)
+            popular_recipes = rng.sample(recipe_ids, len(recipe_ids))
+            self.create_user_lists(Favorite, 'recipe_id',
+                                   options['favorites'], user_ids,
+                                   popular_recipes, rng)
+            self.create_user_lists(ShoppingCart, 'recipe_id',
+                                   options['carts'], user_ids,
+                                   popular_recipes, rng)
+            authors = rng.sample(user_ids, len(user_ids))
+            self.create_user_lists(Subscription, 'author_id',
+                                   options['follows'], user_ids, authors, rng)
+            # Массовая вставка не вызывает сигналы: пересчитываем
+            # производные данные целиком.
+            recount_counters()
+            if timeline_enabled():
+                rebuild_feed()
+        refresh_popularity()
+        invalidate_recipe_list()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей {len(user_ids)}, рецептов '
+            f'{len(recipe_ids)} за {time.perf_counter() - start:.1f} с. '
+            f'Пароль пользователей: {options["password"]}'
+        ))
@@ -0,0 +1,15 @@
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу; values не должен быть пустым."""
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def latency_summary(latencies):
+    """p50/p95/p99 и максимум задержек в миллисекундах."""
+    return {
+        'p50': round(percentile(latencies, 50) * 1000, 2),
+        'p95': round(percentile(latencies, 95) * 1000, 2),
+        'p99': round(percentile(latencies, 99) * 1000, 2),
+        'max': round(max(latencies) * 1000, 2),
+    }
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+INDEXES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_prefix '
+    'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_trgm '
+    'ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+]
+
+DROP_INDEXES_SQL = [
+    'DROP INDEX IF EXISTS recipes_ingredient_name_upper_trgm',
+    'DROP INDEX IF EXISTS recipes_ingredient_name_upper_prefix',
+]
+
+
+def create_indexes(apps, schema_editor):
+    """
+    Индексы под регистронезависимые LIKE-запросы автодополнения
+    (istartswith/icontains). Создаются только в PostgreSQL.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in INDEXES_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_INDEXES_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.13 on 2026-10-17 06:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Счетчики на момент миграции: (модель, поле-счетчик, считаемая модель,
+# поле связи).
+COUNTERS = [
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorite', 'recipe'),
+    ('recipes.Recipe', 'in_carts_count', 'recipes.ShoppingCart', 'recipe'),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('users.CustomUser', 'subscribers_count', 'users.Subscription', 'author'),
+]
+
+
+def fill_counters(apps, schema_editor):
+    for model_name, counter, counted_name, field in COUNTERS:
+        counted = apps.get_model(counted_name)
+        actual = Coalesce(
+            Subquery(
+                counted.objects.filter(**{field: OuterRef('pk')})
+                .order_by()
+                .values(field)
+                .annotate(count=Count('pk'))
+                .values('count')
+            ),
+            0,
+        )
+        apps.get_model(model_name).objects.update(**{counter: actual})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_keyset_pagination_indexes'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Добавлений в списки покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
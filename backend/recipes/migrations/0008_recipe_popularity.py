@@ -0,0 +1,87 @@
+# Generated by Django 3.2.13 on 2026-10-17 06:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from foodgram.db.operations import VendorRunSQL
+
+DECAYED_SUM_SQL = (
+    'SELECT recipe_id, SUM(POWER(0.5, '
+    'EXTRACT(EPOCH FROM now() - created) / 604800.0)) AS score '
+    'FROM {table} GROUP BY recipe_id'
+)
+
+# PostgreSQL: материализованное представление рейтинга.
+CREATE_VIEW_SQL = [
+    'CREATE MATERIALIZED VIEW recipes_recipepopularity AS '
+    'SELECT recipe.id AS recipe_id, '
+    'COALESCE(favorites.score, 0) AS favorites_score, '
+    'COALESCE(carts.score, 0) AS carts_score, '
+    'COALESCE(favorites.score, 0) + 0.5 * COALESCE(carts.score, 0) AS score '
+    'FROM recipes_recipe recipe '
+    f'LEFT JOIN ({DECAYED_SUM_SQL.format(table="recipes_favorite")}) '
+    'favorites ON favorites.recipe_id = recipe.id '
+    f'LEFT JOIN ({DECAYED_SUM_SQL.format(table="recipes_shoppingcart")}) '
+    'carts ON carts.recipe_id = recipe.id',
+    'CREATE UNIQUE INDEX recipes_recipepopularity_recipe_id '
+    'ON recipes_recipepopularity (recipe_id)',
+    'CREATE INDEX recipes_recipepopularity_score '
+    'ON recipes_recipepopularity (score DESC, recipe_id DESC)',
+]
+
+# Остальные СУБД: сводная таблица, заполняемая refresh_popularity.
+CREATE_TABLE_SQL = [
+    'CREATE TABLE recipes_recipepopularity ('
+    'recipe_id bigint NOT NULL PRIMARY KEY, '
+    'favorites_score double precision NOT NULL, '
+    'carts_score double precision NOT NULL, '
+    'score double precision NOT NULL)',
+    'CREATE INDEX recipes_recipepopularity_score '
+    'ON recipes_recipepopularity (score DESC, recipe_id DESC)',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RecipePopularity',
+            fields=[
+                ('recipe', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='ranking', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('favorites_score', models.FloatField(verbose_name='Вклад избранного')),
+                ('carts_score', models.FloatField(verbose_name='Вклад списков покупок')),
+                ('score', models.FloatField(verbose_name='Популярность')),
+            ],
+            options={
+                'verbose_name': 'Популярность рецепта',
+                'verbose_name_plural': 'Популярность рецептов',
+                'db_table': 'recipes_recipepopularity',
+                'managed': False,
+            },
+        ),
+        VendorRunSQL(
+            'postgresql', CREATE_VIEW_SQL,
+            'DROP MATERIALIZED VIEW recipes_recipepopularity',
+        ),
+        VendorRunSQL(
+            'postgresql', CREATE_TABLE_SQL,
+            'DROP TABLE recipes_recipepopularity', exclude=True,
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.13 on 2026-10-17 07:13
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from foodgram.db.operations import VendorRunSQL
+
+# Вектор рецепта: название (вес A) выше текста (вес B), русская морфология.
+CREATE_SEARCH_SQL = [
+    'CREATE FUNCTION recipes_recipe_search_vector_update() '
+    'RETURNS trigger AS $$ BEGIN '
+    'NEW.search_vector := '
+    "setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B'); "
+    'RETURN NEW; END $$ LANGUAGE plpgsql',
+    # Счетчики избранного и покупок меняются часто, вектор пересчитывается
+    # только при изменении названия или текста. Django записывает
+    # search_vector при полном сохранении, поэтому он тоже в списке.
+    'CREATE TRIGGER recipes_recipe_search_vector '
+    'BEFORE INSERT OR UPDATE OF name, text, search_vector '
+    'ON recipes_recipe FOR EACH ROW '
+    'EXECUTE PROCEDURE recipes_recipe_search_vector_update()',
+    # Триггер заполняет вектор у существующих рецептов.
+    'UPDATE recipes_recipe SET search_vector = NULL',
+    'CREATE INDEX recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+]
+
+DROP_SEARCH_SQL = [
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_drop_redundant_fk_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        # В остальных СУБД поле остается пустым.
+        VendorRunSQL('postgresql', CREATE_SEARCH_SQL, DROP_SEARCH_SQL),
+    ]
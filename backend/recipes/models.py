@@ -1,7 +1,13 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
-from users.models import CustomUser
+from recipes.counters import CounterFieldsMixin
+from recipes.storage import ContentAddressedStorage
+from users.models import CustomUser, Subscription
 
 
 class Tag(models.Model):
@@ -61,12 +67,107 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.name} {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам с подгрузкой связанных данных."""
+
+    def with_related(self):
+        """Подгружает теги и ингредиенты рецептов фиксированным числом
+        запросов."""
+        return self.prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """
+        Аннотирует рецепты признаками избранного, списка покупок
+        и подписки на автора для переданного пользователя.
+        """
+        if user.is_anonymous or settings.USER_STATE_ENABLED:
+            # Для пользователя признаки берутся из множеств в памяти
+            # (recipes.user_state), без подзапросов.
+            return self.select_related('author')
+        recipe = models.OuterRef('pk')
+        return self.annotate(
+            favorited=models.Exists(
+                Favorite.objects.filter(user=user, recipe=recipe)
+            ),
+            in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(user=user, recipe=recipe)
+            ),
+        ).prefetch_related(
+            models.Prefetch(
+                'author',
+                queryset=CustomUser.objects.annotate(
+                    is_subscribed=models.Exists(
+                        Subscription.objects.filter(
+                            user=user,
+                            author=models.OuterRef('pk'),
+                        )
+                    )
+                ),
+            ),
+        )
+
+    def feed(self, user, strategy=None):
+        """
+        Рецепты авторов, на которых подписан пользователь, новые первыми.
+        Стратегия join выбирает их по подпискам с индексом
+        (author, pub_date); timeline читает готовую ленту FeedEntry,
+        заполняемую при публикации рецепта (RECIPE_FEED_STRATEGY).
+        """
+        strategy = strategy or settings.RECIPE_FEED_STRATEGY
+        if strategy == 'timeline':
+            return self.filter(feed_entries__user=user).annotate(
+                feed_date=models.F('feed_entries__pub_date')
+            ).order_by('-feed_date', '-id')
+        return self.filter(
+            author__in=Subscription.objects.filter(user=user).values('author')
+        ).order_by('-pub_date', '-id')
+
+    def latest_per_author(self, author_ids, limit):
+        """
+        Последние limit рецептов каждого из авторов одним запросом:
+        рецепты нумеруются ROW_NUMBER() OVER (PARTITION BY author_id)
+        в порядке убывания даты публикации.
+        """
+        author_ids = list(author_ids)
+        if not author_ids:
+            # Пустой IN не компилируется в SQL подзапроса.
+            return self.none()
+        ranked = Recipe.objects.filter(author__in=author_ids).annotate(
+            row_number=models.Window(
+                expression=RowNumber(),
+                partition_by=[models.F('author')],
+                order_by=[
+                    models.F('pub_date').desc(),
+                    models.F('id').desc(),
+                ],
+            )
+        ).order_by().values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.row_number <= %s',
+            (*params, limit),
+        ))
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Рецепты."""
 
     pub_date = models.DateTimeField(
@@ -110,6 +211,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='recipes/images/',
+        storage=ContentAddressedStorage(),
     )
 
     author = models.ForeignKey(
@@ -117,12 +219,46 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Автор',
         related_name='recipes',
+        # Поиск по автору покрывает индекс recipe_author_pub_date_idx.
+        db_index=False,
+    )
+
+    favorites_count = models.IntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+
+    in_carts_count = models.IntegerField(
+        verbose_name='Добавлений в списки покупок',
+        default=0,
+        editable=False,
+    )
+
+    # Заполняется триггером PostgreSQL (recipes.search), GIN-индекс
+    # создается миграцией.
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['name', 'author'],
@@ -134,14 +270,29 @@ class Recipe(models.Model):
         return self.name
 
 
+class RecipeIngredientQuerySet(models.QuerySet):
+
+    def shopping_list(self, user):
+        """Суммы ингредиентов рецептов из списка покупок пользователя."""
+        return self.filter(
+            recipe__is_in_shopping_cart__user=user
+        ).values(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).annotate(
+            amount_sum=models.Sum('amount')
+        ).order_by('ingredient__name')
+
+
 class RecipeIngredient(models.Model):
     """Необходимое количество ингредиентов."""
 
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
-        related_name='recipe',
+        related_name='recipe_ingredients',
         verbose_name='Рецепт',
+        # Покрывается уникальным индексом (recipe, ingredient).
+        db_index=False,
     )
 
     ingredient = models.ForeignKey(
@@ -160,6 +311,8 @@ class RecipeIngredient(models.Model):
         ]
     )
 
+    objects = RecipeIngredientQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Количество ингредиента'
         verbose_name_plural = 'Количество ингредиентов'
@@ -185,6 +338,8 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Избранные рецепты',
         related_name='favorites',
+        # Покрывается уникальным индексом (user, recipe).
+        db_index=False,
     )
 
     recipe = models.ForeignKey(
@@ -194,6 +349,11 @@ class Favorite(models.Model):
         related_name='is_favorited',
     )
 
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+    )
+
     class Meta:
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
@@ -220,6 +380,8 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Список покупок',
         related_name='shopping_cart',
+        # Покрывается уникальным индексом (user, recipe).
+        db_index=False,
     )
 
     recipe = models.ForeignKey(
@@ -229,6 +391,11 @@ class ShoppingCart(models.Model):
         related_name='is_in_shopping_cart',
     )
 
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+    )
+
     class Meta:
         default_related_name = 'shopping'
         verbose_name = 'Рецепт в списке покупок'
@@ -242,3 +409,88 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в список покупок'
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписчика: рецепт автора, на которого он подписан.
+    Заполняется при публикации рецепта (fan-out on write).
+    """
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed_entries',
+        # Покрывается уникальным индексом (user, recipe).
+        db_index=False,
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+    )
+
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class RecipePopularity(models.Model):
+    """
+    Рейтинг популярности рецептов по добавлениям в избранное и покупки
+    с затуханием по времени. В PostgreSQL - материализованное
+    представление, в остальных СУБД - сводная таблица; обновляется
+    командой refresh_popularity.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_constraint=False,
+        related_name='ranking',
+        verbose_name='Рецепт',
+    )
+
+    favorites_score = models.FloatField(
+        verbose_name='Вклад избранного',
+    )
+
+    carts_score = models.FloatField(
+        verbose_name='Вклад списков покупок',
+    )
+
+    score = models.FloatField(
+        verbose_name='Популярность',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipepopularity'
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score:.2f}'
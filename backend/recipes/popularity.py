@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipes.catalog import invalidate_recipe_list
+
+# Вклад добавления в избранное/покупки уменьшается вдвое каждые
+# HALF_LIFE_DAYS дней; добавление в покупки весит CART_WEIGHT избранного.
+# В PostgreSQL те же веса записаны в представлении (миграция 0008),
+# поэтому их изменение требует новой миграции.
+HALF_LIFE_DAYS = 7
+CART_WEIGHT = 0.5
+
+POPULARITY_TABLE = 'recipes_recipepopularity'
+
+
+def decayed_scores(model):
+    """Сумма затухающих весов добавлений по рецептам."""
+    now = timezone.now()
+    half_life = HALF_LIFE_DAYS * 86400.0
+    scores = defaultdict(float)
+    rows = model.objects.order_by().values_list('recipe_id', 'created')
+    for recipe_id, created in rows.iterator():
+        age = (now - created).total_seconds()
+        scores[recipe_id] += 0.5 ** (age / half_life)
+    return scores
+
+
+def refresh_summary_table():
+    from recipes.models import (Favorite, Recipe, RecipePopularity,
+                                ShoppingCart)
+
+    favorites = decayed_scores(Favorite)
+    carts = decayed_scores(ShoppingCart)
+    with transaction.atomic():
+        RecipePopularity.objects.all().delete()
+        RecipePopularity.objects.bulk_create(
+            [
+                RecipePopularity(
+                    recipe_id=recipe_id,
+                    favorites_score=favorites[recipe_id],
+                    carts_score=carts[recipe_id],
+                    score=favorites[recipe_id]
+                    + CART_WEIGHT * carts[recipe_id],
+                )
+                for recipe_id in Recipe.objects.values_list('id', flat=True)
+            ],
+            batch_size=1000,
+        )
+
+
+def refresh_popularity(concurrently=True):
+    """
+    Пересчитывает рейтинг. В PostgreSQL обновляет материализованное
+    представление; CONCURRENTLY не блокирует чтение рейтинга.
+    """
+    if connection.vendor != 'postgresql':
+        refresh_summary_table()
+    else:
+        option = ' CONCURRENTLY' if concurrently else ''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'REFRESH MATERIALIZED VIEW{option} {POPULARITY_TABLE}'
+            )
+    invalidate_recipe_list()
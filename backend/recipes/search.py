@@ -0,0 +1,33 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+# Конфигурация полнотекстового поиска PostgreSQL: русская морфология.
+SEARCH_CONFIG = 'russian'
+# Вектор (название с весом A, текст с весом B) поддерживается триггером
+# из миграции 0012, в остальных СУБД поле остается пустым.
+
+
+def search_recipes(queryset, value):
+    """
+    Рецепты, подходящие под поисковую строку, по убыванию релевантности
+    (аннотация rank). В PostgreSQL - полнотекстовый поиск по GIN-индексу
+    search_vector, в остальных СУБД - поиск подстроки в названии и тексте,
+    совпадения в названии выше.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        )
+    else:
+        queryset = queryset.filter(
+            Q(name__icontains=value) | Q(text__icontains=value)
+        ).annotate(rank=Case(
+            When(name__icontains=value, then=Value(1.0)),
+            default=Value(0.5),
+            output_field=FloatField(),
+        ))
+    return queryset.order_by('-rank', '-id')
@@ -0,0 +1,93 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.catalog import (invalidate_ingredient_catalog,
+                             invalidate_recipe, invalidate_recipe_authors,
+                             invalidate_tag_registry)
+from recipes.counters import change_counter
+from recipes.feed import fan_out_recipe, timeline_enabled
+from recipes.images import schedule_renditions
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.user_state import invalidate_user_state
+from users.models import CustomUser
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    invalidate_ingredient_catalog()
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, **kwargs):
+    invalidate_tag_registry()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+def counted_object_created(sender, instance, created, **kwargs):
+    if created:
+        update_counter(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+def counted_object_deleted(sender, instance, **kwargs):
+    update_counter(sender, instance, -1)
+
+
+def update_counter(sender, instance, delta):
+    if sender in (Favorite, ShoppingCart):
+        invalidate_user_state(instance.user_id)
+    if sender is Favorite:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', delta)
+    elif sender is ShoppingCart:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', delta)
+    elif sender is Recipe:
+        change_counter(CustomUser, instance.author_id, 'recipes_count', delta)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created and timeline_enabled():
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if instance.image:
+        name, storage = instance.image.name, instance.image.storage
+        callback = partial(invalidate_recipe, instance.pk)
+        transaction.on_commit(
+            lambda: schedule_renditions(name, storage, callback)
+        )
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipe(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipe(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    for pk in (pk_set or ()) if reverse else [instance.pk]:
+        invalidate_recipe(pk)
+
+
+@receiver(post_save, sender=CustomUser)
+def author_changed(sender, instance, update_fields, **kwargs):
+    # Вход пользователя меняет только last_login, не видимый в ответах.
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        invalidate_recipe_authors()
@@ -0,0 +1,36 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, именующее файлы по SHA-256 содержимого.
+    Повторная загрузка того же файла не создает копию.
+    """
+
+    @property
+    def exact(self):
+        """То же хранилище, сохраняющее файлы под переданными именами."""
+        return FileSystemStorage(
+            location=self.location,
+            base_url=self.base_url,
+            file_permissions_mode=self.file_permissions_mode,
+            directory_permissions_mode=self.directory_permissions_mode,
+        )
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(os.path.dirname(name), digest.hexdigest() + ext)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
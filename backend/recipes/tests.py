@@ -0,0 +1,480 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from api.tests import (NO_RESPONSE_CACHE, RECIPES_URL, MediaRootMixin,
+                       RecipeFixtureMixin, create_recipes, create_user,
+                       image_data)
+from recipes.management.commands import import_ings
+from recipes.models import (FeedEntry, Favorite, Ingredient, Recipe,
+                            RecipePopularity, ShoppingCart, Tag)
+from users.models import CustomUser, Subscription
+
+
+class CountersTest(RecipeFixtureMixin, TestCase):
+    """Сохранение объекта не затирает счетчики, измененные после загрузки."""
+
+    def test_recipe_save_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipes[2].pk)
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        recipe.text = 'Новый текст'
+        recipe.save()
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        self.assertEqual(recipe.text, 'Новый текст')
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count), (1, 1)
+        )
+
+    def test_deferred_recipe_save(self):
+        recipe = Recipe.objects.defer('search_vector', 'text').get(
+            pk=self.recipes[2].pk
+        )
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        recipe.name = 'Новое название'
+        recipe.save()
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1)
+
+    def test_user_save_keeps_counters(self):
+        author = CustomUser.objects.get(pk=self.authors[1].pk)
+        Subscription.objects.create(user=self.user, author=author)
+        author.set_password('new-password-123')
+        author.save()
+        author = CustomUser.objects.get(pk=author.pk)
+        self.assertTrue(author.check_password('new-password-123'))
+        self.assertEqual(
+            (author.recipes_count, author.subscribers_count), (4, 1)
+        )
+
+    def test_explicit_counter_update(self):
+        recipe = Recipe.objects.get(pk=self.recipes[2].pk)
+        recipe.favorites_count = 7
+        recipe.save(update_fields=['favorites_count'])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 7)
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE)
+class PopularityTest(RecipeFixtureMixin, TestCase):
+    """Рейтинг по избранному и покупкам, пересчитываемый командой."""
+
+    def setUp(self):
+        super().setUp()
+        for user in self.authors:
+            Favorite.objects.create(user=user, recipe=self.recipes[5])
+        for user in self.authors[:2]:
+            Favorite.objects.create(user=user, recipe=self.recipes[3])
+        call_command('refresh_popularity', stdout=StringIO())
+        self.expected = [
+            recipe.pk for recipe in (
+                self.recipes[5], self.recipes[3],
+                self.recipes[0], self.recipes[1],
+            )
+        ] + sorted(
+            (recipe.pk for recipe in self.recipes[2:] if recipe.pk not in (
+                self.recipes[3].pk, self.recipes[5].pk,
+            )),
+            reverse=True,
+        )
+
+    def ids(self, response):
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_refresh(self):
+        scores = dict(RecipePopularity.objects.values_list('recipe', 'score'))
+        self.assertEqual(len(scores), len(self.recipes))
+        self.assertAlmostEqual(scores[self.recipes[5].pk], 3, places=3)
+        self.assertAlmostEqual(scores[self.recipes[1].pk], 0.5, places=3)
+        self.assertEqual(scores[self.recipes[2].pk], 0)
+
+    def test_ordering(self):
+        for url, params in (
+            (RECIPES_URL, {'ordering': '-popularity'}),
+            (f'{RECIPES_URL}popular/', {}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'limit': 12, **params})
+                self.assertEqual(self.ids(response), self.expected)
+
+    def test_cursor(self):
+        ids = []
+        url, params = RECIPES_URL, {
+            'ordering': '-popularity', 'limit': 5, 'cursor': '',
+        }
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += self.ids(response)
+            url, params = response.data['next'], {}
+        self.assertEqual(ids, self.expected)
+
+    def test_new_recipe_ranked_after_refresh(self):
+        recipe, = create_recipes(
+            create_user('newcomer'), 1, self.tags, self.ingredients
+        )
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        url = f'{RECIPES_URL}popular/'
+        response = self.client.get(url, {'limit': 20})
+        self.assertNotIn(recipe.pk, self.ids(response))
+        call_command('refresh_popularity', stdout=StringIO())
+        response = self.client.get(url, {'limit': 20})
+        self.assertEqual(self.ids(response)[2], recipe.pk)
+
+
+@override_settings(
+    RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE, RECIPE_FEED_STRATEGY='timeline'
+)
+class FeedTest(RecipeFixtureMixin, TestCase):
+    """Ленты join и timeline отдают одни и те же страницы."""
+
+    def setUp(self):
+        super().setUp()
+        # Подписка из общих данных создана без ленты timeline.
+        output = StringIO()
+        call_command('rebuild_feed', stdout=output)
+        self.assertIn('Записей в лентах: 4', output.getvalue())
+        self.client.force_authenticate(self.user)
+
+    def get_pages(self, strategy, **params):
+        """Страницы ленты по ссылкам next, по 3 рецепта."""
+        pages = []
+        url, params = f'{RECIPES_URL}feed/', {'limit': 3, **params}
+        with self.settings(RECIPE_FEED_STRATEGY=strategy):
+            while url:
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                pages.append(
+                    [recipe['id'] for recipe in response.data['results']]
+                )
+                url, params = response.data['next'], {}
+        return pages
+
+    def assert_feeds_equal(self, *authors):
+        expected = [
+            recipe.pk for recipe in Recipe.objects.filter(
+                author__in=authors
+            ).order_by('-pub_date', '-id')
+        ]
+        expected = [
+            expected[start:start + 3] for start in range(0, len(expected), 3)
+        ] or [[]]
+        for strategy in ('join', 'timeline'):
+            for params in ({}, {'cursor': ''}):
+                with self.subTest(strategy=strategy, params=params):
+                    self.assertEqual(
+                        self.get_pages(strategy, **params), expected
+                    )
+
+    def test_rebuild(self):
+        self.assert_feeds_equal(self.authors[0])
+
+    def test_new_recipe(self):
+        recipe = Recipe.objects.create(
+            author=self.authors[0], name='Новый рецепт', text='Текст',
+            cooking_time=5, image='recipes/images/test.png',
+        )
+        self.assert_feeds_equal(self.authors[0])
+        self.assertEqual(self.get_pages('timeline')[0][0], recipe.pk)
+
+    def test_follow(self):
+        Subscription.objects.create(user=self.user, author=self.authors[1])
+        self.assert_feeds_equal(self.authors[0], self.authors[1])
+
+    def test_unfollow(self):
+        Subscription.objects.filter(
+            user=self.user, author=self.authors[0]
+        ).delete()
+        self.assert_feeds_equal()
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_recipe_delete(self):
+        self.recipes[1].delete()
+        self.assert_feeds_equal(self.authors[0])
+
+
+class ImportIngredientsMixin:
+    """Файлы для import_ings во временной папке data."""
+
+    def setUp(self):
+        super().setUp()
+        data_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_root)
+        patcher = mock.patch.object(import_ings, 'DATA_ROOT', data_root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data_root = data_root
+
+    def write(self, filename, content):
+        path = os.path.join(self.data_root, filename)
+        with open(path, 'w', encoding='utf8', newline='') as file:
+            file.write(content)
+
+    def import_file(self, filename, *args):
+        output = StringIO()
+        with self.assertLogs('foodgram.import_ings'):
+            call_command('import_ings', filename, *args, stdout=output)
+        return output.getvalue()
+
+
+class ImportIngredientsTest(ImportIngredientsMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def rows(self):
+        return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+    def test_csv(self):
+        self.write('ingredients.csv', (
+            'сахар,г\n'
+            'соль,г\n'
+            '\n'
+            '"мука, пшеничная",г\n'
+            'сахар,г\n'
+        ))
+        output = self.import_file('ingredients.csv')
+        self.assertIn('Прочитано 4 строк, новых 2', output)
+        self.assertEqual(self.rows(), {
+            ('соль', 'г'), ('сахар', 'г'), ('мука, пшеничная', 'г'),
+        })
+        output = self.import_file('ingredients.csv')
+        self.assertIn('новых 0', output)
+
+    def test_json(self):
+        self.write('ingredients.json', json.dumps([
+            {'name': 'сахар', 'measurement_unit': 'г'},
+            {'name': 'соль', 'measurement_unit': 'г'},
+            {'name': 'сахар', 'measurement_unit': 'кг'},
+        ]))
+        output = self.import_file('ingredients.json', '--batch-size', '1')
+        self.assertIn('Прочитано 3 строк, новых 2', output)
+        self.assertEqual(self.rows(), {
+            ('соль', 'г'), ('сахар', 'г'), ('сахар', 'кг'),
+        })
+
+    def test_dry_run(self):
+        self.write('ingredients.csv', 'сахар,г\n')
+        output = self.import_file('ingredients.csv', '--dry-run')
+        self.assertIn('новых 1', output)
+        self.assertIn('dry run', output)
+        self.assertEqual(self.rows(), {('соль', 'г')})
+
+    def test_malformed(self):
+        cases = [
+            ('bad.csv', 'сахар,г\nперец\n', 'bad.csv:2: ожидается 2'),
+            ('bad.csv', 'сахар,г,лишнее\n', 'bad.csv:1: ожидается 2'),
+            ('bad.csv', 'сахар, \n', 'bad.csv:1: пустое'),
+            ('bad.csv', f'{"я" * 151},г\n', 'bad.csv:1: значение длиннее'),
+            ('bad.json', '[{"name": "сахар"}]', 'bad.json: элемент 1'),
+            ('bad.json', '[["сахар", "г"]]', 'bad.json: элемент 1'),
+            ('bad.json', '{"name": "сахар"}', 'bad.json: ожидается список'),
+            ('bad.json', '[{"name": "сахар",', 'bad.json: некорректный'),
+        ]
+        for filename, content, message in cases:
+            with self.subTest(content=content):
+                self.write(filename, content)
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command('import_ings', filename, stdout=StringIO())
+        self.assertEqual(self.rows(), {('соль', 'г')})
+
+    def test_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command('import_ings', 'missing.csv', stdout=StringIO())
+
+
+INGREDIENTS_URL = '/api/ingredients/'
+
+
+@override_settings(
+    RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE, INGREDIENT_CATALOG_ENABLED=True
+)
+class IngredientCatalogTest(
+    ImportIngredientsMixin, MediaRootMixin, RecipeFixtureMixin, TestCase
+):
+    """Справочник ингредиентов в памяти процесса видит изменения."""
+
+    def setUp(self):
+        super().setUp()
+        for name in ('фасоль', 'соль поваренная', 'морская соль', 'соль'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        self.admin = CustomUser.objects.create_superuser(
+            username='admin', email='admin@example.com',
+            password='admin-password', first_name='a', last_name='a',
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, name):
+        response = self.client.get(INGREDIENTS_URL, {'name': name})
+        return [ingredient['name'] for ingredient in response.data]
+
+    def create_recipe(self, ingredient_ids):
+        return self.client.post(RECIPES_URL, {
+            'name': 'Рецепт из справочника',
+            'text': 'Текст',
+            'cooking_time': 5,
+            'tags': [self.tags[0].pk],
+            'ingredients': [
+                {'id': pk, 'amount': 1} for pk in ingredient_ids
+            ],
+            'image': image_data(),
+        }, format='json')
+
+    def test_prefix_matches_first(self):
+        expected = ['соль', 'соль поваренная', 'морская соль', 'фасоль']
+        self.assertEqual(self.search('соль'), expected)
+        with self.settings(INGREDIENT_CATALOG_ENABLED=False):
+            self.assertEqual(self.search('соль'), expected)
+
+    def test_admin_edit(self):
+        ingredient = Ingredient.objects.get(name='фасоль')
+        self.search('соль')
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            f'/admin/recipes/ingredient/{ingredient.pk}/change/',
+            {'name': 'фасоль белая', 'measurement_unit': 'г'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('фасоль белая', self.search('соль'))
+        self.assertNotIn('фасоль', self.search('соль'))
+
+    def test_admin_delete(self):
+        ingredient = Ingredient.objects.get(name='фасоль')
+        self.assertEqual(self.create_recipe([ingredient.pk]).status_code, 201)
+        Recipe.objects.filter(name='Рецепт из справочника').delete()
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            f'/admin/recipes/ingredient/{ingredient.pk}/delete/',
+            {'post': 'yes'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('фасоль', self.search('соль'))
+        self.client.force_authenticate(self.user)
+        response = self.create_recipe([self.ingredients[0].pk, ingredient.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['ingredients'][1]['id'], [
+            f'Ингредиент {ingredient.pk} не найден.'
+        ])
+
+    def test_import(self):
+        self.search('соль')
+        self.write('ingredients.csv', 'соль крупная,г\n')
+        self.import_file('ingredients.csv')
+        self.assertIn('соль крупная', self.search('соль'))
+        ingredient = Ingredient.objects.get(name='соль крупная')
+        self.assertEqual(self.create_recipe([ingredient.pk]).status_code, 201)
+
+
+TAGS_URL = '/api/tags/'
+
+
+class TagRegistryTest(RecipeFixtureMixin, TestCase):
+    """Условные запросы тегов по ETag."""
+
+    def test_not_modified(self):
+        response = self.client.get(TAGS_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        for url in (TAGS_URL, f'{TAGS_URL}{self.tags[0].pk}/'):
+            with self.subTest(url=url):
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_edit_changes_etag(self):
+        etag = self.client.get(TAGS_URL)['ETag']
+        tag = Tag.objects.get(pk=self.tags[0].pk)
+        tag.name = 'Поздний завтрак'
+        tag.save()
+        response = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['name'], 'Поздний завтрак')
+        response = self.client.get(
+            TAGS_URL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_delete_changes_etag(self):
+        etag = self.client.get(TAGS_URL)['ETag']
+        Tag.objects.filter(pk=self.tags[1].pk).delete()
+        response = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE)
+class RecipeSearchTest(RecipeFixtureMixin, TestCase):
+    """Поиск вместе с фильтрами, совпадения в названии выше."""
+
+    def setUp(self):
+        super().setUp()
+        breakfast, lunch = self.tags
+        self.found = {}
+        for key, author, name, text, tag in (
+            ('name', self.authors[0], 'борщ украинский', 'свекла', breakfast),
+            ('text', self.authors[1], 'суп', 'почти борщ', lunch),
+            ('lunch', self.authors[1], 'борщ зеленый', 'щавель', lunch),
+            ('other', self.authors[2], 'каша', 'овсянка', lunch),
+        ):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=5,
+                image='recipes/images/test.png',
+            )
+            recipe.tags.set([tag])
+            self.found[key] = recipe.pk
+        for key in ('name', 'text'):
+            Favorite.objects.create(
+                user=self.user, recipe_id=self.found[key]
+            )
+        self.client.force_authenticate(self.user)
+
+    def search(self, **params):
+        response = self.client.get(
+            RECIPES_URL, {'search': 'борщ', 'limit': 20, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def expected(self, *keys):
+        return [self.found[key] for key in keys]
+
+    def test_rank(self):
+        self.assertEqual(
+            self.search(), self.expected('lunch', 'name', 'text')
+        )
+
+    def test_filters(self):
+        cases = [
+            ({'tags': 'lunch'}, ('lunch', 'text')),
+            ({'tags': ['breakfast', 'lunch']}, ('lunch', 'name', 'text')),
+            ({'author': self.authors[1].pk}, ('lunch', 'text')),
+            ({'is_favorited': 1}, ('name', 'text')),
+            ({'is_favorited': 1, 'tags': 'lunch'}, ('text',)),
+            ({'author': self.authors[2].pk}, ()),
+        ]
+        for params, keys in cases:
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.search(**params), self.expected(*keys)
+                )
+
+    def test_cursor(self):
+        ids, url, params = [], RECIPES_URL, {
+            'search': 'борщ', 'tags': 'lunch', 'limit': 1, 'cursor': '',
+        }
+        while url:
+            response = self.client.get(url, params)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url, params = response.data['next'], {}
+        self.assertEqual(ids, self.expected('lunch', 'text'))
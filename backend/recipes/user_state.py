@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from foodgram.db.replicas import use_primary
+from recipes.catalog import bump_version, get_version
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+# Число пользователей, чьи множества хранятся в памяти процесса.
+MAX_USERS = 1000
+
+
+def user_state_version_key(user_id):
+    return f'user_state_version:{user_id}'
+
+
+class UserState:
+    """
+    Неизменяемые множества id рецептов в избранном и в списке покупок
+    пользователя и id авторов, на которых он подписан.
+    """
+
+    def __init__(self, user_id, version):
+        self.version = version
+        self.favorites = frozenset(Favorite.objects.filter(
+            user=user_id
+        ).values_list('recipe', flat=True))
+        self.cart = frozenset(ShoppingCart.objects.filter(
+            user=user_id
+        ).values_list('recipe', flat=True))
+        self.following = frozenset(Subscription.objects.filter(
+            user=user_id
+        ).values_list('author', flat=True))
+
+
+_states = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_user_state(user_id):
+    """
+    Множества пользователя из памяти процесса; перечитываются из основной
+    базы после смены версии в общем кэше.
+    """
+    version = get_version(user_state_version_key(user_id))
+    with _lock:
+        state = _states.get(user_id)
+        if state is not None and state.version == version:
+            _states.move_to_end(user_id)
+            return state
+    with use_primary():
+        state = UserState(user_id, version)
+    with _lock:
+        _states[user_id] = state
+        _states.move_to_end(user_id)
+        while len(_states) > MAX_USERS:
+            _states.popitem(last=False)
+    return state
+
+
+def get_request_user_state(request):
+    """Множества текущего пользователя, один раз за запрос; None для
+    анонимов или при выключенном USER_STATE_ENABLED."""
+    if (
+        not settings.USER_STATE_ENABLED
+        or request is None
+        or request.user.is_anonymous
+    ):
+        return None
+    state = getattr(request, '_user_state', None)
+    if state is None:
+        state = request._user_state = get_user_state(request.user.pk)
+    return state
+
+
+def invalidate_user_state(user_id):
+    bump_version(user_state_version_key(user_id))
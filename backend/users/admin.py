@@ -12,6 +12,8 @@ class CustomUserAdmin(UserAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
+        'subscribers_count',
     ]
     list_filter = [
         'email',
@@ -0,0 +1,106 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+
+from recipes.catalog import bump_version, get_version
+
+# Число токенов, хранимых в памяти процесса.
+MAX_TOKENS = 1000
+TOKEN_KEY = 'auth_token:{}'
+
+_tokens = OrderedDict()
+_lock = threading.Lock()
+
+
+def auth_version_key(user_id):
+    return f'auth_version:{user_id}'
+
+
+def token_digest(key):
+    """Ключ кэша не содержит сам токен."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_auth_cache(user_id):
+    """Сбрасывает закэшированные токены пользователя во всех процессах."""
+    bump_version(auth_version_key(user_id))
+
+
+def load_user(user_id):
+    """Активный пользователь из основной базы без хеша пароля."""
+    return get_user_model().objects.using(DEFAULT_DB_ALIAS).defer(
+        'password'
+    ).filter(pk=user_id, is_active=True).first()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к базе при повторных обращениях.
+
+    В общем кэше по хешу токена хранятся только id пользователя и его
+    версия, не дольше TOKEN_AUTH_CACHE['TIMEOUT'] секунд; сам
+    пользователь хранится в памяти процесса (не больше MAX_TOKENS
+    токенов) или загружается из базы. Запись действительна, пока
+    не сменилась версия пользователя: она меняется при выходе (удалении
+    токена), сохранении и удалении пользователя, в том числе при смене
+    пароля и деактивации.
+    """
+
+    def authenticate_credentials(self, key):
+        config = settings.TOKEN_AUTH_CACHE
+        if not config['ENABLED']:
+            return super().authenticate_credentials(key)
+        digest = token_digest(key)
+        user = self.get_cached(digest)
+        if user is not None:
+            # Запросу нужны только ключ и пользователь токена.
+            return user, self.get_model()(key=key, user=user)
+
+        user, token = super().authenticate_credentials(key)
+        # Id пользователя известен только после загрузки, поэтому
+        # изменение, зафиксированное между загрузкой и чтением версии,
+        # может остаться в кэше, но не дольше TIMEOUT.
+        version = get_version(auth_version_key(user.pk))
+        cache.set(
+            TOKEN_KEY.format(digest), (user.pk, version),
+            timeout=config['TIMEOUT'],
+        )
+        self.remember(digest, version, user)
+        return user, token
+
+    def get_cached(self, digest):
+        with _lock:
+            item = _tokens.get(digest)
+        if item is not None and item[0] > time.monotonic():
+            _, user_id, version, data = item
+            if get_version(auth_version_key(user_id)) != version:
+                return None
+            # Каждый запрос получает свой объект пользователя.
+            return pickle.loads(data)
+        entry = cache.get(TOKEN_KEY.format(digest))
+        if entry is None:
+            return None
+        user_id, version = entry
+        if get_version(auth_version_key(user_id)) != version:
+            return None
+        user = load_user(user_id)
+        if user is not None:
+            self.remember(digest, version, user)
+        return user
+
+    def remember(self, digest, version, user):
+        expires = time.monotonic() + settings.TOKEN_AUTH_CACHE['TIMEOUT']
+        item = (expires, user.pk, version, pickle.dumps(user))
+        with _lock:
+            _tokens[digest] = item
+            _tokens.move_to_end(digest)
+            while len(_tokens) > MAX_TOKENS:
+                _tokens.popitem(last=False)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.security)
+def check_token_auth_cache(app_configs, **kwargs):
+    """
+    Кэш токенов сбрасывается в других воркерах только через общий кэш:
+    с кэшем в памяти процесса отозванный токен принимается остальными
+    воркерами до TOKEN_AUTH_CACHE['TIMEOUT'] секунд.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if (
+        not settings.TOKEN_AUTH_CACHE['ENABLED']
+        or backend not in settings.PROCESS_CACHE_BACKENDS
+    ):
+        return []
+    return [Warning(
+        'Кэш токенов включен, но кэш не общий для воркеров: выход '
+        'и деактивация видны другим воркерам с задержкой.',
+        hint='Задайте CACHE_BACKEND (Redis, Memcached) или '
+             'TOKEN_AUTH_CACHE_ENABLED=False.',
+        id='users.W001',
+    )]
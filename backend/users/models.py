@@ -1,8 +1,10 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from recipes.counters import CounterFieldsMixin
 
-class CustomUser(AbstractUser):
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
     """
     Модель пользователя.
     Все поля обязательны для заполнения.
@@ -32,10 +34,27 @@ class CustomUser(AbstractUser):
         verbose_name='Пароль'
     )
 
+    recipes_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    subscribers_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ['username']
+        indexes = [
+            models.Index(
+                fields=['-date_joined', '-id'],
+                name='user_date_joined_id_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.username
@@ -48,7 +67,9 @@ class Subscription(models.Model):
         CustomUser,
         related_name='subscriber',
         verbose_name='Подписчик',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # Покрывается уникальным индексом (user, author).
+        db_index=False,
     )
     author = models.ForeignKey(
         CustomUser,
@@ -61,6 +82,12 @@ class Subscription(models.Model):
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='subscription_user_id_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
@@ -2,8 +2,9 @@ from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
-from api.serializers import ShortRecipeSerializer
+from api.utils import get_recipes_limit
 from recipes.models import Recipe
+from recipes.user_state import get_request_user_state
 from users.models import CustomUser, Subscription
 
 
@@ -51,6 +52,12 @@ class CustomUserSerializer(UserSerializer):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
+        state = get_request_user_state(request)
+        if state is not None:
+            return obj.pk in state.following
+        flag = getattr(obj, 'is_subscribed', None)
+        if flag is not None:
+            return flag
         return Subscription.objects.filter(
             user=request.user,
             author=obj,
@@ -65,7 +72,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     email = serializers.ReadOnlyField(source='author.email')
     first_name = serializers.ReadOnlyField(source='author.first_name')
     last_name = serializers.ReadOnlyField(source='author.last_name')
-    recipes_count = serializers.ReadOnlyField(source='author.recipes.count')
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
 
     is_subscribed = serializers.SerializerMethodField(
         method_name='get_is_subscribed'
@@ -86,15 +93,16 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        return Subscription.objects.filter(
-            user=obj.user,
-            author=obj.author
-        ).exists()
+        """Подписка сериализуется для ее владельца, поэтому всегда True."""
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if limit:
-            queryset = queryset[:int(limit)]
+        from api.serializers import ShortRecipeSerializer
+
+        queryset = getattr(obj.author, 'latest_recipes', None)
+        if queryset is None:
+            limit = get_recipes_limit(self.context.get('request'))
+            queryset = Recipe.objects.filter(author=obj.author)
+            if limit:
+                queryset = queryset[:limit]
         return ShortRecipeSerializer(queryset, many=True).data
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import change_counter
+from recipes.feed import follow, timeline_enabled, unfollow
+from recipes.user_state import invalidate_user_state
+from users.authentication import invalidate_auth_cache
+from users.models import CustomUser, Subscription
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        invalidate_user_state(instance.user_id)
+        change_counter(
+            CustomUser, instance.author_id, 'subscribers_count', 1
+        )
+        if timeline_enabled():
+            follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    invalidate_user_state(instance.user_id)
+    change_counter(CustomUser, instance.author_id, 'subscribers_count', -1)
+    if timeline_enabled():
+        unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Выход через djoser token/logout удаляет токен пользователя.
+    invalidate_auth_cache(instance.user_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, update_fields, **kwargs):
+    # Смена пароля, деактивация и правка профиля; вход меняет только
+    # last_login.
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        invalidate_auth_cache(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_auth_cache(instance.pk)
@@ -0,0 +1,148 @@
+import pickle
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.tests import RecipeFixtureMixin, create_user
+from users import authentication
+from users.checks import check_token_auth_cache
+from users.models import CustomUser, Subscription
+
+SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+
+
+class SubscriptionsTest(RecipeFixtureMixin, TestCase):
+
+    def test_no_subscriptions(self):
+        self.client.force_authenticate(create_user('newcomer'))
+        for params in ({}, {'recipes_limit': 3}):
+            with self.subTest(params=params):
+                response = self.client.get(SUBSCRIPTIONS_URL, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['results'], [])
+
+    def test_recipes_limit(self):
+        for author in self.authors[1:]:
+            Subscription.objects.create(user=self.user, author=author)
+        self.client.force_authenticate(self.user)
+        self.client.get(SUBSCRIPTIONS_URL)
+        # COUNT, подписки с авторами, последние рецепты авторов.
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                SUBSCRIPTIONS_URL, {'recipes_limit': 3}
+            )
+        self.assertEqual(len(response.data['results']), 3)
+        for subscription in response.data['results']:
+            self.assertEqual(len(subscription['recipes']), 3)
+            self.assertEqual(subscription['recipes_count'], 4)
+
+    def test_explain_hot_queries_without_subscriptions(self):
+        Subscription.objects.all().delete()
+        output = StringIO()
+        call_command('explain_hot_queries', stdout=output)
+        self.assertIn(
+            'users subscriptions recipes: пустой запрос', output.getvalue()
+        )
+
+
+@override_settings(TOKEN_AUTH_CACHE={'ENABLED': True, 'TIMEOUT': 60})
+class CachedTokenAuthenticationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        authentication._tokens.clear()
+        self.user = create_user('reader')
+        self.token = Token.objects.create(user=self.user)
+        self.backend = authentication.CachedTokenAuthentication()
+
+    def authenticate(self):
+        request = APIRequestFactory().get(
+            '/api/users/me/', HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        return self.backend.authenticate(request)
+
+    def test_process_cache_hit(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_shared_cache_hit(self):
+        self.authenticate()
+        authentication._tokens.clear()
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertIn('password', user.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_no_password_in_shared_cache(self):
+        self.authenticate()
+        key = authentication.TOKEN_KEY.format(
+            authentication.token_digest(self.token.key)
+        )
+        entry = cache.get(key)
+        self.assertEqual(entry[0], self.user.pk)
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(entry))
+        self.assertNotIn(self.token.key.encode(), pickle.dumps(entry))
+
+    def test_logout(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        response = client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_deleted_token(self):
+        self.authenticate()
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deactivation(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deactivation_without_signal(self):
+        self.authenticate()
+        # QuerySet.update() не меняет версию, но пользователь из общего
+        # кэша загружается из базы.
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        authentication._tokens.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class TokenAuthCacheCheckTest(SimpleTestCase):
+    """Кэш токенов с кэшем в памяти процесса: отзыв виден не всем
+    воркерам."""
+
+    def check(self, backend, enabled=True):
+        with override_settings(
+            CACHES={'default': {'BACKEND': backend}},
+            TOKEN_AUTH_CACHE={'ENABLED': enabled, 'TIMEOUT': 60},
+        ):
+            return [error.id for error in check_token_auth_cache(None)]
+
+    def test_process_cache(self):
+        self.assertEqual(
+            self.check('django.core.cache.backends.locmem.LocMemCache'),
+            ['users.W001'],
+        )
+        self.assertEqual(self.check(
+            'django.core.cache.backends.locmem.LocMemCache', enabled=False
+        ), [])
+
+    def test_shared_cache(self):
+        self.assertEqual(self.check('django_redis.cache.RedisCache'), [])
@@ -1,11 +1,12 @@
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.views import UserViewSet
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
-from rest_framework.response import Response
 
 from api.pagination import CustomPagination
-from api.utils import subscrib_delete, subscrib_post
+from api.utils import get_recipes_limit, subscrib_delete, subscrib_post
+from recipes.models import Recipe
 from users.models import CustomUser, Subscription
 from users.serializers import SubscriptionSerializer
 
@@ -45,17 +46,24 @@ class SubscribeView(UserViewSet):
         permission_classes=(IsAuthenticated, ),)
     def subscriptions(self, request):
         user = request.user
-        queryset = Subscription.objects.filter(user=user)
+        limit = get_recipes_limit(request)
+        queryset = Subscription.objects.filter(user=user).select_related(
+            'author'
+        )
         pages = self.paginate_queryset(queryset)
+
+        if pages:
+            recipes = Recipe.objects.all()
+            if limit:
+                recipes = recipes.latest_per_author(
+                    [subscription.author_id for subscription in pages], limit
+                )
+            prefetch_related_objects(pages, Prefetch(
+                'author__recipes', queryset=recipes, to_attr='latest_recipes'
+            ))
         serializer = SubscriptionSerializer(
             pages,
             many=True,
             context={'request': request}
         )
-
-        response_data = {
-            'count': len(pages),
-            'next': self.paginator.get_next_link(),
-            'previous': self.paginator.get_previous_link(),
-            'results': serializer.data}
-        return Response(response_data)
+        return self.get_paginated_response(serializer.data)